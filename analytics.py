@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+from dataset import FEATURE_COLUMNS, PASS_THRESHOLD
+
+# Dashboard subject labels and the columns they are backed by
+SUBJECT_COLUMNS = {
+    'Math': 'Internal_Assessment_1',
+    'Science': 'Internal_Assessment_2',
+    'English': 'Previous_Semester_Grade',
+    'History': 'Attendance_Percentage',
+    'Art': 'Participation_Score'
+}
+
+# Attendance buckets; the last one is closed on the right like np.histogram
+ATTENDANCE_BINS = [0, 60, 70, 80, 90, 100]
+ATTENDANCE_LABELS = ['0-60%', '60-70%', '70-80%', '80-90%', '90-100%']
+
+
+def predict_cohort(model, df):
+    return np.asarray(model.predict(df[FEATURE_COLUMNS]), dtype=float)
+
+
+def class_averages(df):
+    return {col: float(value) for col, value in df[FEATURE_COLUMNS].mean().items()}
+
+
+def normalize_name(name):
+    return name.strip().lower()
+
+
+def normalize_student_id(student_id):
+    return student_id.strip().upper()
+
+
+def _first_positions(keys):
+    # Map each key to the position of its first row, so repeated names
+    # resolve to the same student the old linear scan returned.
+    keys = keys.reset_index(drop=True)
+    keys = keys[keys.notna() & ~keys.duplicated()]
+    return dict(zip(keys.tolist(), keys.index.tolist()))
+
+
+def name_index(df):
+    # Vectorized equivalent of normalize_name over the whole column
+    return _first_positions(df['Name'].astype('string').str.strip().str.lower())
+
+
+def id_index(df):
+    if 'Student_ID' not in df.columns:
+        return {}
+    return _first_positions(df['Student_ID'].astype('string').str.strip().str.upper())
+
+
+def prefix_index(names):
+    # Sorted (key, row) pairs for each lowercased full name and each word in
+    # it, so "eli" and "nguy" both find "Elizabeth Nguyen" by binary search.
+    lowered = names.astype('string').str.lower().fillna('').reset_index(drop=True)
+    keys = pd.concat([lowered, lowered.str.split().explode()]).dropna()
+    keys = keys[keys != '']
+    order = np.argsort(keys.to_numpy(dtype=object), kind='stable')
+    return keys.to_numpy(dtype=object)[order], keys.index.to_numpy(dtype=np.int64)[order]
+
+
+def prefix_search(index, term):
+    """Row positions, in data order, whose name or one of its words starts with term."""
+    keys, rows = index
+    term = normalize_name(term)
+    start = np.searchsorted(keys, term, side='left')
+    end = np.searchsorted(keys, term + '\U0010ffff', side='left')
+    return np.unique(rows[start:end])
+
+
+def cohort_analytics(df, predictions, averages):
+    # Performance trends (weekly/monthly - using index as time)
+    performance_trend = df[['Internal_Assessment_1', 'Internal_Assessment_2']].mean(axis=1).tolist()
+
+    subject_scores = {label: averages[col] for label, col in SUBJECT_COLUMNS.items()}
+
+    attendance = df['Attendance_Percentage'].to_numpy(dtype=float)
+    counts, _ = np.histogram(attendance[~np.isnan(attendance)], bins=ATTENDANCE_BINS)
+    attendance_distribution = dict(zip(ATTENDANCE_LABELS, map(int, counts)))
+
+    pass_fail_distribution = {
+        'Pass': int((predictions >= PASS_THRESHOLD).sum()),
+        'Fail': int((predictions < PASS_THRESHOLD).sum())
+    }
+
+    return {
+        'performance_trend': performance_trend,
+        'subject_scores': subject_scores,
+        'attendance_distribution': attendance_distribution,
+        'pass_fail_distribution': pass_fail_distribution
+    }
+
+
+def student_analytics(student, prediction, averages):
+    # Individual student performance data
+    individual_performance = {col: float(student[col]) for col in FEATURE_COLUMNS}
+
+    # Performance trend for the student (using both internal assessments)
+    performance_trend = [
+        individual_performance['Internal_Assessment_1'],
+        individual_performance['Internal_Assessment_2']
+    ]
+
+    # Subject scores comparison (student vs class average)
+    subject_comparison = {
+        label: {'student': individual_performance[col], 'average': averages[col]}
+        for label, col in SUBJECT_COLUMNS.items()
+    }
+
+    return {
+        'student_info': {
+            'name': student['Name'],
+            'id': None if pd.isna(student.get('Student_ID')) else student['Student_ID']
+        },
+        'individual_performance': individual_performance,
+        'performance_trend': performance_trend,
+        'subject_comparison': subject_comparison,
+        'prediction': {
+            'score': float(prediction),
+            'result': "Pass" if prediction >= PASS_THRESHOLD else "Fail"
+        },
+        'attendance_comparison': {
+            'student': individual_performance['Attendance_Percentage'],
+            'average': averages['Attendance_Percentage']
+        },
+        'class_averages': dict(averages)
+    }
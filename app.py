@@ -1,22 +1,191 @@
+import os
+import threading
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import pandas as pd
-import joblib
-import numpy as np
+
+import cohorts
+import dataset
+import explain
+import export
+import inference
+import ingest
+import metrics
+import models
+import scoring
+import store
+import students
+import training
+from analytics import (class_averages, cohort_analytics, id_index, name_index, normalize_name,
+                       normalize_student_id, predict_cohort, student_analytics)
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Load model and data
-model = joblib.load("model_pipeline.pkl")
-df = pd.read_csv("student_performance_60.csv")
+# Coalesce concurrent /predict calls arriving within this window (0 disables)
+app.config['PREDICT_BATCH_WINDOW_MS'] = float(os.environ.get('PREDICT_BATCH_WINDOW_MS', 0))
+app.config['PREDICT_BATCH_MAX_ROWS'] = int(os.environ.get('PREDICT_BATCH_MAX_ROWS', 64))
+# Let requests sent with an X-Profile header be sampled (see /debug/profile/<id>)
+app.config['PROFILE_REQUESTS'] = os.environ.get('PROFILE_REQUESTS', '') not in ('', '0')
+# Loaded cohorts beyond this many MB are evicted, least recently used first
+app.config['COHORT_MEMORY_BUDGET_MB'] = float(os.environ.get('COHORT_MEMORY_BUDGET_MB',
+                                                             cohorts.DEFAULT_MEMORY_BUDGET_MB))
+
+metrics.instrument(app)
+
+# Load model and data. The notebook's pickle seeds the versioned model store.
+model_version = models.import_once("model_pipeline.pkl")
+model = inference.optimize(models.load(model_version))
+
+def score(block, source):
+    with metrics.span('model'):
+        scores = scoring.predict_block(model, block)
+    metrics.INFERENCE_CALLS.inc(source=source)
+    metrics.ROWS_SCORED.inc(len(block), source=source)
+    return scores
+
+def score_cohort(df):
+    with metrics.span('model'):
+        predictions = predict_cohort(model, df)
+    metrics.INFERENCE_CALLS.inc(source='cohort')
+    metrics.ROWS_SCORED.inc(len(df), source='cohort')
+    return predictions
+
+# Per-version artifacts, rebuilt in the background whenever data is published
+dataset.register('predictions', lambda ds: score_cohort(ds.df), uses_model=True)
+dataset.register('class_averages', lambda ds: class_averages(ds.df))
+dataset.register('name_index', lambda ds: name_index(ds.df))
+dataset.register('id_index', lambda ds: id_index(ds.df))
+dataset.register('analytics', lambda ds: cohort_analytics(ds.df, ds.artifact('predictions'),
+                                                          ds.artifact('class_averages')), uses_model=True)
+dataset.register('analytics_body', lambda ds: app.json.dumps(ds.artifact('analytics')), uses_model=True)
+dataset.register('students_body', lambda ds: app.json.dumps(students.to_records(ds.df)))
+dataset.register('tip_codes', lambda ds: explain.tip_codes(ds.df))
+dataset.register('features', lambda ds: ds.df[dataset.FEATURE_COLUMNS].to_numpy(dtype=float))
+# Attributions are only worked out for the students someone asks about, and
+# the previous version's rows that did not change are not explained again
+dataset.register('attributions',
+                 lambda ds: explain.Attributions(tree_explainer(ds.model_version), ds.seed('attributions')),
+                 uses_model=True, lazy=True, seeded=True)
+dataset.register('at_risk_body', lambda ds: app.json.dumps(at_risk_report(ds)), uses_model=True, lazy=True)
+
+def contributions(ds, positions):
+    with metrics.span('model'):
+        return ds.artifact('attributions').shap_values(ds.artifact('features')[positions])
+
+def at_risk_report(ds):
+    return explain.at_risk_report(ds.df, ds.artifact('predictions'), lambda positions: contributions(ds, positions),
+                                  ds.artifact('tip_codes'))
+
+_explainer = (None, None)
+_explainer_lock = threading.Lock()
+
+def tree_explainer(version):
+    """The attribution tables for model version, built once per version.
+
+    Loaded from the model store rather than taken from the serving model, so
+    a dataset published just before a swap is explained by its own model.
+    """
+    global _explainer
+    with _explainer_lock:
+        cached, explainer = _explainer
+        if cached != version:
+            try:
+                explainer = explain.TreeExplainer.from_model(models.load(version))
+            except explain.ExplainError as e:
+                # Remembered too, so an unexplainable model is not loaded on every request
+                explainer = str(e)
+            _explainer = (version, explainer)
+    if isinstance(explainer, str):
+        raise explain.ExplainError(explainer)
+    return explainer
+
+def install_model(name):
+    """Serve model version name; each cohort republishes its predictions on next use."""
+    global model, model_version
+    candidate = inference.optimize(models.load(name))
+    model, model_version = candidate, name
+
+# Retrains and rollbacks move the model store's CURRENT pointer before they
+# respond, so every worker serves the new model from its next request on
+model_follower = store.Follower(lambda: model_version, install_model, root=models.MODEL_DIR)
+app.before_request(model_follower.poll)
+
+def save_model(candidate, report):
+    name = models.save(candidate, report)
+    model_follower.poll()
+    return name
+
+retrainer = training.Retrainer(lambda: model, save_model, os.path.join(models.MODEL_DIR, '.jobs'))
 
-@app.route('/students', methods=['GET'])
-def get_students():
-    return jsonify(df.to_dict(orient='records'))
+registry = cohorts.Registry(lambda: model_version, app.config['COHORT_MEMORY_BUDGET_MB'] * 2**20)
+store.convert_once("student_performance_60.csv")
+registry.get(cohorts.DEFAULT_COHORT)
+
+def cohort_route(rule, **options):
+    """Route rule for the default cohort, and under /cohorts/<cohort> for any cohort."""
+    def decorator(view):
+        app.route(f'/cohorts/<cohort>{rule}', **options)(view)
+        return app.route(rule, defaults={'cohort': cohorts.DEFAULT_COHORT}, **options)(view)
+    return decorator
+
+@app.errorhandler(cohorts.CohortNotFound)
+def cohort_not_found(e):
+    return jsonify({'error': str(e)}), 404
+
+def _by_cohort(read):
+    return lambda: {(cohort.name,): read(cohort.current()) for cohort in registry.loaded()}
+
+metrics.Gauge('dataset_rows', 'Students in each loaded cohort.', _by_cohort(lambda ds: len(ds.df)),
+              labels=('cohort',))
+metrics.Gauge('dataset_columns', 'Columns in each loaded cohort.', _by_cohort(lambda ds: len(ds.df.columns)),
+              labels=('cohort',))
+metrics.Gauge('dataset_generation', 'Versions of each loaded cohort published since it was loaded.',
+              _by_cohort(lambda ds: ds.generation), labels=('cohort',))
+metrics.Gauge('dataset_info', 'Version of each loaded cohort, data and model.',
+              lambda: {(cohort.name, cohort.current().version): 1 for cohort in registry.loaded()},
+              labels=('cohort', 'version'))
+metrics.Gauge('cohort_memory_bytes', 'Approximate memory held by each loaded cohort.',
+              _by_cohort(lambda ds: ds.nbytes), labels=('cohort',))
+metrics.Gauge('model_info', 'Version of the serving model.', lambda: {(model_version,): 1}, labels=('version',))
+
+batcher = None
+if app.config['PREDICT_BATCH_WINDOW_MS'] > 0:
+    batcher = scoring.MicroBatcher(lambda block: score(block, 'micro_batch'),
+                                   app.config['PREDICT_BATCH_WINDOW_MS'] / 1000,
+                                   app.config['PREDICT_BATCH_MAX_ROWS'])
+
+@cohort_route('/students', methods=['GET'])
+def get_students(cohort):
+    ds = registry.get(cohort).current()
+    if not request.args:
+        # The full roster is encoded once per dataset version
+        response = app.response_class(ds.artifact('students_body'), mimetype='application/json')
+        response.set_etag(ds.data_version)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
 
-@app.route('/predict', methods=['POST'])
-def predict():
+    try:
+        with metrics.span('pandas'):
+            positions, fields = students.select(ds, request.args, ds.artifact('predictions'))
+        if students.is_paginated(request.args):
+            with metrics.span('pandas'):
+                window, page_info = students.page(ds, request.args, positions)
+            with metrics.span('serialize'):
+                return jsonify({'students': students.records(ds.df, window, fields), **page_info})
+        chunks = students.stream_records(ds.df, positions, fields, app.json.dumps)
+        return app.response_class(metrics.timed('serialize', chunks), mimetype='application/json')
+    except students.StaleCursorError as e:
+        return jsonify({'error': str(e)}), 409
+    except students.QueryError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@cohort_route('/predict', methods=['POST'])
+def predict(cohort):
+    # One model serves every cohort; the cohort only has to exist
+    cohorts.require(cohort)
     try:
         data = request.json
         features = [[
@@ -26,174 +195,196 @@ def predict():
             data['Previous_Semester_Grade'],
             data['Participation_Score']
         ]]
-        prediction = model.predict(features)[0]
+        if batcher is not None:
+            prediction = batcher.submit(features[0]).result()
+        else:
+            prediction = score(features, 'predict')[0]
         result = "Pass" if prediction >= 15 else "Fail"
         return jsonify({'prediction': result, 'score': float(prediction)})
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
-@app.route('/analytics', methods=['GET'])
-def get_analytics():
+@cohort_route('/predict/batch', methods=['POST'])
+def predict_batch(cohort):
+    cohorts.require(cohort)
+    try:
+        fmt = scoring.batch_format(request.content_type)
+        with metrics.span('pandas'):
+            block, ids = scoring.parse_batch(request.get_data(), fmt)
+        scores = score(block, 'batch')
+        chunks = scoring.stream_results(scores, ids, fmt)
+        return app.response_class(metrics.timed('serialize', chunks), mimetype=scoring.MIMETYPES[fmt])
+    except scoring.BatchError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@cohort_route('/analytics', methods=['GET'])
+def get_analytics(cohort):
+    ds = registry.get(cohort).current()
+    try:
+        # Served from the snapshot built when this dataset version was published
+        response = app.response_class(ds.artifact('analytics_body'), mimetype='application/json')
+        response.set_etag(ds.version)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@cohort_route('/analytics/<student_name>', methods=['GET'])
+def get_student_analytics(cohort, student_name):
+    ds = registry.get(cohort).current()
+    try:
+        return _student_analytics_response(ds, ds.artifact('name_index').get(normalize_name(student_name)))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@cohort_route('/analytics/id/<student_id>', methods=['GET'])
+def get_student_analytics_by_id(cohort, student_id):
+    ds = registry.get(cohort).current()
     try:
-        # Performance trends (weekly/monthly - using index as time)
-        performance_trend = df[['Internal_Assessment_1', 'Internal_Assessment_2']].mean(axis=1).tolist()
-        
-        # Subject scores
-        subject_scores = {
-            'Math': float(df['Internal_Assessment_1'].mean()),
-            'Science': float(df['Internal_Assessment_2'].mean()),
-            'English': float(df['Previous_Semester_Grade'].mean()),
-            'History': float(df['Attendance_Percentage'].mean()),
-            'Art': float(df['Participation_Score'].mean())
-        }
-        
-        # Attendance distribution
-        attendance_distribution = {
-            '0-60%': int(((df['Attendance_Percentage'] >= 0) & (df['Attendance_Percentage'] < 60)).sum()),
-            '60-70%': int(((df['Attendance_Percentage'] >= 60) & (df['Attendance_Percentage'] < 70)).sum()),
-            '70-80%': int(((df['Attendance_Percentage'] >= 70) & (df['Attendance_Percentage'] < 80)).sum()),
-            '80-90%': int(((df['Attendance_Percentage'] >= 80) & (df['Attendance_Percentage'] < 90)).sum()),
-            '90-100%': int(((df['Attendance_Percentage'] >= 90) & (df['Attendance_Percentage'] <= 100)).sum())
-        }
-        
-        # Predictions
-        predictions = model.predict(df[[ 
-            'Internal_Assessment_1', 'Internal_Assessment_2',
-            'Attendance_Percentage', 'Previous_Semester_Grade',
-            'Participation_Score'
-        ]])
-        pass_fail_distribution = {
-            'Pass': int(sum(predictions >= 15)),
-            'Fail': int(sum(predictions < 15))
-        }
-        
-        return jsonify({
-            'performance_trend': performance_trend,
-            'subject_scores': subject_scores,
-            'attendance_distribution': attendance_distribution,
-            'pass_fail_distribution': pass_fail_distribution
-        })
+        return _student_analytics_response(ds, ds.artifact('id_index').get(normalize_student_id(student_id)))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/analytics/<student_name>', methods=['GET'])
-def get_student_analytics(student_name):
+def _student_analytics_response(ds, position):
+    if position is None:
+        return jsonify({'error': 'Student not found'}), 404
+
+    with metrics.span('pandas'):
+        student = ds.df.iloc[position]
+        prediction = ds.artifact('predictions')[position]
+        analytics = student_analytics(student, prediction, ds.artifact('class_averages'))
+    with metrics.span('serialize'):
+        return jsonify(analytics)
+
+@cohort_route('/explain/<student_id>', methods=['GET'])
+def explain_student(cohort, student_id):
+    ds = registry.get(cohort).current()
     try:
-        # Find student by name
-        student_data = df[df['Name'].str.lower() == student_name.lower()]
-        
-        if student_data.empty:
+        position = ds.artifact('id_index').get(normalize_student_id(student_id))
+        if position is None:
             return jsonify({'error': 'Student not found'}), 404
-        
-        student = student_data.iloc[0]
-        
-        # Individual student performance data
-        individual_performance = {
-            'Internal_Assessment_1': float(student['Internal_Assessment_1']),
-            'Internal_Assessment_2': float(student['Internal_Assessment_2']),
-            'Attendance_Percentage': float(student['Attendance_Percentage']),
-            'Previous_Semester_Grade': float(student['Previous_Semester_Grade']),
-            'Participation_Score': float(student['Participation_Score'])
-        }
-        
-        # Performance trend for the student (using both internal assessments)
-        performance_trend = [
-            float(student['Internal_Assessment_1']),
-            float(student['Internal_Assessment_2'])
-        ]
-        
-        # Subject scores comparison (student vs class average)
-        subject_comparison = {
-            'Math': {
-                'student': float(student['Internal_Assessment_1']),
-                'average': float(df['Internal_Assessment_1'].mean())
-            },
-            'Science': {
-                'student': float(student['Internal_Assessment_2']),
-                'average': float(df['Internal_Assessment_2'].mean())
-            },
-            'English': {
-                'student': float(student['Previous_Semester_Grade']),
-                'average': float(df['Previous_Semester_Grade'].mean())
-            },
-            'History': {
-                'student': float(student['Attendance_Percentage']),
-                'average': float(df['Attendance_Percentage'].mean())
-            },
-            'Art': {
-                'student': float(student['Participation_Score']),
-                'average': float(df['Participation_Score'].mean())
-            }
-        }
-        
-        # Individual prediction
-        student_features = [[
-            student['Internal_Assessment_1'],
-            student['Internal_Assessment_2'],
-            student['Attendance_Percentage'],
-            student['Previous_Semester_Grade'],
-            student['Participation_Score']
-        ]]
-        prediction = model.predict(student_features)[0]
-        prediction_result = {
-            'score': float(prediction),
-            'result': "Pass" if prediction >= 15 else "Fail"
-        }
-        
-        # Attendance comparison
-        attendance_comparison = {
-            'student': float(student['Attendance_Percentage']),
-            'average': float(df['Attendance_Percentage'].mean())
-        }
-        
-        return jsonify({
-            'student_info': {
-                'name': student['Name'],
-                'id': student['Student_ID']
-            },
-            'individual_performance': individual_performance,
-            'performance_trend': performance_trend,
-            'subject_comparison': subject_comparison,
-            'prediction': prediction_result,
-            'attendance_comparison': attendance_comparison,
-            'class_averages': {
-                'Internal_Assessment_1': float(df['Internal_Assessment_1'].mean()),
-                'Internal_Assessment_2': float(df['Internal_Assessment_2'].mean()),
-                'Attendance_Percentage': float(df['Attendance_Percentage'].mean()),
-                'Previous_Semester_Grade': float(df['Previous_Semester_Grade'].mean()),
-                'Participation_Score': float(df['Participation_Score'].mean())
-            }
-        })
+        explanation = explain.student_explanation(ds.df.iloc[position], ds.artifact('predictions')[position],
+                                                  contributions(ds, [position])[0], ds.artifact('tip_codes')[position],
+                                                  ds.artifact('attributions').expected_value)
+        return jsonify(explanation)
+    except explain.ExplainError as e:
+        return jsonify({'error': str(e)}), 501
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@cohort_route('/at-risk', methods=['GET'])
+def get_at_risk(cohort):
+    ds = registry.get(cohort).current()
+    try:
+        response = app.response_class(ds.artifact('at_risk_body'), mimetype='application/json')
+        response.set_etag(ds.version)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    except explain.ExplainError as e:
+        return jsonify({'error': str(e)}), 501
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/upload', methods=['POST'])
-def upload_file():
+@cohort_route('/upload', methods=['POST'])
+def upload_file(cohort):
+    # Uploading to a new cohort with the default replace mode creates it
+    cohort = registry.get(cohort, create=True)
     try:
         file = request.files['file']
         if file and file.filename.endswith('.csv'):
-            df_new = pd.read_csv(file)
-            # Validate required columns
-            required_columns = ['Name', 'Internal_Assessment_1', 'Internal_Assessment_2', 
-                              'Attendance_Percentage', 'Previous_Semester_Grade', 'Participation_Score']
-            if all(col in df_new.columns for col in required_columns):
-                df_new.to_csv("updated_student_performance.csv", index=False)
-                global df
-                df = df_new  # Update the in-memory dataframe
-                return jsonify({'message': 'File uploaded successfully! Data updated.'}), 200
-            else:
-                return jsonify({'message': 'CSV file missing required columns!'}), 400
+            mode = request.form.get('mode', request.args.get('mode', 'replace'))
+            # Other workers may have saved since this request began; build on the newest version
+            with cohort.updating() as ds:
+                if ds is None and mode != 'replace':
+                    return jsonify({'message': f'Cohort not found: {cohort.name}'}), 404
+                with metrics.span('pandas'):
+                    df_new, summary = ingest.ingest(ds, file, mode)
+                with metrics.span('store'):
+                    cohort.save(df_new)
+            return jsonify({'message': 'File uploaded successfully! Data updated.', 'mode': mode, **summary}), 200
         return jsonify({'message': 'Invalid file format! Please upload a CSV file.'}), 400
+    except ingest.IngestError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Error processing file: {str(e)}'}), 500
+    finally:
+        # Rejected uploads must not leave empty cohorts behind in the registry
+        registry.discard(cohort)
 
-@app.route('/download', methods=['GET'])
-def download_file():
+@cohort_route('/download', methods=['GET'])
+def download_file(cohort):
+    ds = registry.get(cohort).current()
     try:
-        df.to_csv("current_student_data.csv", index=False)
-        return jsonify({'message': 'File ready for download', 'filename': 'current_student_data.csv'})
+        fmt = request.args.get('format', 'csv')
+        mimetype, extension = export.check_format(fmt)
+
+        # Exports are cached per dataset version, keyed by format and query;
+        # the cache outlives model swaps, so result= exports also key on the model
+        key = (students.version_for(ds, request.args), tuple(sorted(request.args.items())))
+        cache = ds.artifact('export_cache', lambda ds: export.ExportCache())
+        body = cache.get(key)
+        if body is None:
+            with metrics.span('pandas'):
+                positions, fields = students.select(ds, request.args, ds.artifact('predictions'))
+            parts = metrics.timed('serialize', export.stream(ds.df[fields], positions, fmt))
+            body = export.cached_stream(cache, key, parts)
+
+        response = app.response_class(body, mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename=student_data.{extension}'
+        response.set_etag(f'{key[0]}-{dataset.content_key(key[1])}')
+        return response.make_conditional(request)
+    except (export.ExportError, students.QueryError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/model', methods=['GET'])
+def get_model():
+    try:
+        return jsonify({'current': models.meta(model_version),
+                        'history': [models.meta(name) for name in models.history()]})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/model/retrain', methods=['POST'])
+def retrain_model():
+    # Trains on the default cohort unless ?cohort= names another
+    ds = registry.get(request.args.get('cohort', cohorts.DEFAULT_COHORT)).current()
+    job, started = retrainer.submit(ds)
+    if not started:
+        return jsonify({'error': 'A retraining job is already running', 'job': job}), 409
+    return jsonify(job), 202
+
+@app.route('/model/jobs/<job_id>', methods=['GET'])
+def get_retrain_job(job_id):
+    job = retrainer.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/model/rollback', methods=['POST'])
+def rollback_model():
+    try:
+        models.rollback()
+        model_follower.poll()
+        return jsonify(models.meta(model_version))
+    except models.RollbackError as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/debug/profile/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    profile = metrics.get_profile(profile_id)
+    if profile is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return app.response_class(profile, mimetype='text/plain')
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000, use_reloader=False)
@@ -0,0 +1,187 @@
+"""Benchmark the Flask API in-process against synthetic cohorts.
+
+    python benchmark.py                                  # 1k, 10k and 100k students
+    python benchmark.py --sizes 1000 1000000
+    python benchmark.py --save benchmark_baseline.json   # record a new baseline
+    python benchmark.py --compare benchmark_baseline.json
+
+Every endpoint goes through Flask's test client, so timings include routing
+and JSON encoding but no network. For each dataset size and endpoint it
+reports latency percentiles, throughput, the first (cold) request and the
+peak Python/NumPy allocation of one request.
+"""
+import argparse
+import atexit
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# Keep benchmark data and models out of the real stores
+for variable in ('STUDENT_STORE_DIR', 'STUDENT_COHORT_DIR', 'STUDENT_MODEL_DIR'):
+    if variable not in os.environ:
+        os.environ[variable] = tempfile.mkdtemp(prefix='student-bench-')
+        atexit.register(shutil.rmtree, os.environ[variable], ignore_errors=True)
+
+import app as api  # noqa: E402
+import cohorts  # noqa: E402
+import synthetic  # noqa: E402
+from dataset import FEATURE_COLUMNS  # noqa: E402
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+DEFAULT_ITERATIONS = 30
+
+# Share of the cohort sent as a weekly attendance delta in the upsert case
+DELTA_FRACTION = 0.01
+
+# p50 slowdown, relative to the baseline, reported as a regression; changes
+# smaller than MIN_REGRESSION_MS are timer noise for sub-millisecond routes
+REGRESSION_THRESHOLD = 0.20
+MIN_REGRESSION_MS = 1.0
+
+
+def _cases(df, iterations):
+    student = df.iloc[len(df) // 2]
+    batch = df[FEATURE_COLUMNS].head(1000).to_json(orient='records')
+    single = {col: float(student[col]) for col in FEATURE_COLUMNS}
+    full_csv = df.to_csv(index=False).encode('utf-8')
+    delta = df[['Student_ID', 'Attendance_Percentage']].sample(frac=DELTA_FRACTION, random_state=0)
+    delta_csv = delta.to_csv(index=False).encode('utf-8')
+    search = str(student['Name']).split()[-1][:4]
+    uploads = max(1, iterations // 10)
+
+    def upload(body, mode):
+        return lambda client: client.post('/upload', data={'file': (io.BytesIO(body), 'students.csv'), 'mode': mode},
+                                          content_type='multipart/form-data')
+
+    # Uploads publish new versions, so they run after the read-only cases
+    return [
+        ('GET /students', iterations, lambda client: client.get('/students')),
+        ('GET /students page', iterations,
+         lambda client: client.get('/students?limit=100&sort=-Attendance_Percentage')),
+        ('GET /students search', iterations, lambda client: client.get(f'/students?search={search}&fields=Name')),
+        ('POST /predict', iterations, lambda client: client.post('/predict', json=single)),
+        ('POST /predict/batch 1k', iterations,
+         lambda client: client.post('/predict/batch', data=batch, content_type='application/json')),
+        ('GET /analytics', iterations, lambda client: client.get('/analytics')),
+        ('GET /analytics/<name>', iterations, lambda client: client.get(f"/analytics/{student['Name']}")),
+        ('GET /analytics/id/<id>', iterations, lambda client: client.get(f"/analytics/id/{student['Student_ID']}")),
+        ('GET /explain/<id>', iterations, lambda client: client.get(f"/explain/{student['Student_ID']}")),
+        ('GET /at-risk', iterations, lambda client: client.get('/at-risk')),
+        ('GET /download csv', iterations, lambda client: client.get('/download')),
+        ('GET /download csv.gz filtered', iterations,
+         lambda client: client.get('/download?format=csv.gz&min_Attendance_Percentage=90')),
+        ('POST /upload upsert', uploads, upload(delta_csv, 'upsert')),
+        ('POST /upload replace', uploads, upload(full_csv, 'replace')),
+    ]
+
+
+def _request(client, call):
+    start = time.perf_counter()
+    response = call(client)
+    response.get_data()  # drain streamed bodies
+    elapsed = time.perf_counter() - start
+    if response.status_code >= 400:
+        raise RuntimeError(f'{response.status_code}: {response.get_data(as_text=True)[:200]}')
+    return elapsed
+
+
+def _measure(client, call, iterations):
+    cold = _request(client, call)
+    latencies = np.array([_request(client, call) for _ in range(iterations)])
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    _request(client, call)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'cold_ms': round(cold * 1e3, 3),
+        'p50_ms': round(float(np.percentile(latencies, 50)) * 1e3, 3),
+        'p95_ms': round(float(np.percentile(latencies, 95)) * 1e3, 3),
+        'p99_ms': round(float(np.percentile(latencies, 99)) * 1e3, 3),
+        'rps': round(float(iterations / latencies.sum()), 1),
+        'peak_mb': round(peak / 2**20, 2)
+    }
+
+
+def _publish(df):
+    start = time.perf_counter()
+    api.registry.get(cohorts.DEFAULT_COHORT).save(df).warm()
+    return round((time.perf_counter() - start) * 1e3, 3)
+
+
+def run(sizes, iterations, seed=0):
+    client = api.app.test_client()
+    results = {}
+    for size in sizes:
+        df = synthetic.generate(size, seed)
+        size_results = {'publish': {'cold_ms': _publish(df)}}
+        for name, count, call in _cases(df, iterations):
+            size_results[name] = _measure(client, call, count)
+            print(f'{size:>9} {name:<30} {size_results[name]}', file=sys.stderr)
+        results[str(size)] = size_results
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__
+        },
+        'iterations': iterations,
+        'results': results
+    }
+
+
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    """Print p50 changes against the baseline and return the regressions."""
+    regressions = []
+    for size, cases in report['results'].items():
+        for name, stats in cases.items():
+            before = baseline['results'].get(size, {}).get(name)
+            metric = 'p50_ms' if 'p50_ms' in stats else 'cold_ms'
+            if not before or not before.get(metric):
+                continue
+            change = stats[metric] / before[metric] - 1
+            slower = stats[metric] - before[metric] > MIN_REGRESSION_MS
+            flag = 'REGRESSION' if change > threshold and slower else ''
+            print(f'{size:>9} {name:<30} {before[metric]:>10.2f} -> {stats[metric]:>10.2f} ms {change:+7.1%} {flag}')
+            if flag:
+                regressions.append((size, name, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the student API in-process.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='write the report to this JSON file')
+    parser.add_argument('--compare', help='compare against a saved baseline report')
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.iterations, args.seed)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(report, json.load(f)):
+                sys.exit(1)
+    if not args.save and not args.compare:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import dataset
+import metrics
+import store
+
+# Unscoped routes serve this cohort from the original store directory
+DEFAULT_COHORT = 'default'
+
+# Every other cohort is a store of its own under this directory
+COHORT_DIR = os.environ.get('STUDENT_COHORT_DIR', 'student_cohorts')
+
+# Also keeps cohort names safe to use as directory names
+COHORT_NAME = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$')
+
+DEFAULT_MEMORY_BUDGET_MB = 512
+
+
+class CohortNotFound(LookupError):
+    pass
+
+
+def root_for(name):
+    if name == DEFAULT_COHORT:
+        return store.STORE_DIR
+    return os.path.join(COHORT_DIR, name)
+
+
+def require(name):
+    """Raise CohortNotFound unless name has data, without loading it."""
+    # The default cohort is seeded at start-up, so its hot paths skip the read
+    if name != DEFAULT_COHORT and (not COHORT_NAME.match(name) or store.current_version(root_for(name)) is None):
+        raise CohortNotFound(f'Cohort not found: {name}')
+
+
+class Cohort:
+    """One cohort's store and the dataset versions published from it."""
+
+    def __init__(self, name, model_version):
+        self.name = name
+        self.root = root_for(name)
+        self._model_version = model_version
+        self._current = None
+        self._generation = 0
+        # Re-entrant so an upload can sync while it holds the cohort
+        self._lock = threading.RLock()
+        self._follower = store.Follower(self._source, self._load, self.root)
+
+    def _source(self):
+        ds = self._current
+        return ds.source if ds is not None else None
+
+    def current(self):
+        return self._current
+
+    def publish(self, df, source=None):
+        with self._lock:
+            self._generation += 1
+            # Artifacts carry over from the version this one replaces where still valid
+            previous = self._current
+            ds = dataset.Dataset(df, self._generation, source, self._model_version(), previous)
+            self._current = ds
+        if previous is not None:
+            previous.retire()
+        return dataset.prebuild(ds)
+
+    def _load(self, name):
+        with metrics.span('store'):
+            self.publish(store.load(self.root, name), name)
+
+    def save(self, df):
+        """Write df as the cohort's next store version and serve the mapped copy."""
+        name = store.save(df, self.root)
+        return self.publish(store.load(self.root, name), name)
+
+    def sync(self):
+        """Return the current version, catching up with the store and the serving model.
+
+        Returns None for a cohort with no data yet.
+        """
+        if self._current is None:
+            with self._lock:
+                name = store.current_version(self.root)
+                if self._current is None and name is not None:
+                    self._load(name)
+        if self._current is None:
+            return None
+        self._follower.poll()
+        # Predictions belong to the model, so a swapped model republishes lazily;
+        # artifacts of the data alone carry over to the new version
+        if self._current.model_version != self._model_version():
+            with self._lock:
+                ds = self._current
+                if ds.model_version != self._model_version():
+                    self.publish(ds.df, ds.source)
+        return self._current
+
+    @contextmanager
+    def updating(self):
+        """Serialize read-modify-save cycles across threads and worker processes.
+
+        Yields the newest version (None for a new cohort); save the derived
+        frame before leaving the block so no two updates share a base.
+        """
+        with store.locked(self.root), self._lock:
+            yield self.sync()
+
+    @property
+    def nbytes(self):
+        ds = self._current
+        return ds.nbytes if ds is not None else 0
+
+
+class Registry:
+    """Cohorts loaded on first use and evicted least recently used first.
+
+    Whenever the loaded cohorts' data and artifacts exceed `budget` bytes,
+    the oldest are dropped; they reload from their store on next use.
+    """
+
+    def __init__(self, model_version, budget=DEFAULT_MEMORY_BUDGET_MB * 2**20):
+        self.model_version = model_version
+        self.budget = budget
+        self._cohorts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name, create=False):
+        """The named cohort, synced. With create, a cohort with no data yet is returned too."""
+        if not COHORT_NAME.match(name):
+            raise CohortNotFound(f'Cohort not found: {name}')
+        with self._lock:
+            cohort = self._cohorts.get(name)
+            if cohort is None:
+                cohort = self._cohorts[name] = Cohort(name, self.model_version)
+            self._cohorts.move_to_end(name)
+        if cohort.sync() is None and not create:
+            self.discard(cohort)
+            raise CohortNotFound(f'Cohort not found: {name}')
+        self._evict(keep=cohort)
+        return cohort
+
+    def discard(self, cohort):
+        """Forget cohort if it still has no data, e.g. after a failed first upload."""
+        with self._lock:
+            if self._cohorts.get(cohort.name) is cohort and cohort.current() is None:
+                del self._cohorts[cohort.name]
+
+    def loaded(self):
+        with self._lock:
+            return [cohort for cohort in self._cohorts.values() if cohort.current() is not None]
+
+    def _evict(self, keep):
+        with self._lock:
+            total = sum(cohort.nbytes for cohort in self._cohorts.values())
+            for name, cohort in list(self._cohorts.items()):
+                if total <= self.budget:
+                    break
+                if cohort is keep:
+                    continue
+                total -= cohort.nbytes
+                del self._cohorts[name]
+                metrics.COHORT_EVICTIONS.inc()
+                # Reloading builds a new version, so the evicted one's queued builds are wasted
+                ds = cohort.current()
+                if ds is not None:
+                    ds.retire()
@@ -0,0 +1,13 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# test_app.py is the mock API the frontend is developed against, not a test module
+collect_ignore = ['test_app.py']
+
+# Keep test data and models out of the real stores; set before any module reads them
+for variable in ('STUDENT_STORE_DIR', 'STUDENT_COHORT_DIR', 'STUDENT_MODEL_DIR'):
+    if variable not in os.environ:
+        os.environ[variable] = tempfile.mkdtemp(prefix='student-test-')
+        atexit.register(shutil.rmtree, os.environ[variable], ignore_errors=True)
@@ -0,0 +1,227 @@
+import hashlib
+import itertools
+import os
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pandas as pd
+
+# Model input columns, in the order the pipeline was trained on
+FEATURE_COLUMNS = [
+    'Internal_Assessment_1',
+    'Internal_Assessment_2',
+    'Attendance_Percentage',
+    'Previous_Semester_Grade',
+    'Participation_Score'
+]
+
+# Predicted final exam score needed to pass
+PASS_THRESHOLD = 15
+
+# Entries of a dict or list artifact measured when estimating its size
+SIZE_SAMPLE = 64
+
+
+class ArtifactUnavailable(Exception):
+    """Raised by a builder whose artifact cannot exist for a version, e.g.
+    attributions of a model that cannot be explained; warm() and prebuild skip it."""
+
+
+def _new_executor():
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix='dataset-build')
+
+
+# Derived artifacts are built on a background thread when a new version is
+# published, so request handlers never pay for them on the hot path.
+_executor = _new_executor()
+_builders = {}
+# Registered artifacts that change with the model, e.g. predictions
+_model_artifacts = set()
+# Registered artifacts built when first asked for, never by warm() or prebuild()
+_lazy_artifacts = set()
+# Registered artifacts whose builders may reuse the previous version's value
+_seeded_artifacts = set()
+
+
+def _after_fork():
+    # The parent's build thread does not exist in a forked worker
+    global _executor
+    _executor = _new_executor()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def content_hash(df):
+    hashed = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.sha1(hashed.tobytes())
+    digest.update(','.join(map(str, df.columns)).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def content_key(value):
+    return hashlib.sha1(repr(value).encode('utf-8')).hexdigest()[:16]
+
+
+def estimate_nbytes(value):
+    """Rough memory held by value; large dicts and lists are sampled."""
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        sample = list(itertools.islice(value.items(), SIZE_SAMPLE))
+        each = sum(estimate_nbytes(k) + estimate_nbytes(v) for k, v in sample)
+        return sys.getsizeof(value) + each * len(value) // max(len(sample), 1)
+    if isinstance(value, (list, tuple)):
+        sample = value[:SIZE_SAMPLE]
+        each = sum(estimate_nbytes(item) for item in sample)
+        return sys.getsizeof(value) + each * len(value) // max(len(sample), 1)
+    return sys.getsizeof(value)
+
+
+class Dataset:
+    """One immutable, published version of the student data.
+
+    `source` names the store version the frame was loaded from, if any.
+    Artifacts such as predictions also depend on the model, so a
+    `model_version` is folded into `version` when given; `data_version`
+    identifies the frame alone. `previous` is the version this one
+    replaces: if it holds the same data, e.g. republished for another
+    model, its finished artifacts that do not depend on the model carry
+    over. Artifacts built on demand with their own builder must not depend
+    on the model. Builders of seeded artifacts get the previous version's
+    value from seed(). Once a newer
+    version replaces it, retire() skips its queued background builds;
+    requests still holding it build what they ask for on demand.
+    """
+
+    def __init__(self, df, generation, source=None, model_version=None, previous=None):
+        self.df = df
+        self.generation = generation
+        self.source = source
+        self.model_version = model_version
+        same_frame = previous is not None and previous.df is df
+        self.data_version = previous.data_version if same_frame else content_hash(df)
+        self.version = self.data_version
+        if model_version is not None:
+            self.version = content_key((self.data_version, model_version))
+        self._artifacts = {}
+        self._sizes = {}
+        self._df_nbytes = estimate_nbytes(df)
+        self._lock = threading.Lock()
+        self.retired = False
+        self._seeds = {}
+        if previous is not None:
+            self._inherit(previous)
+
+    def _inherit(self, previous):
+        same_data = previous.data_version == self.data_version
+        with previous._lock:
+            for name, future in previous._artifacts.items():
+                # Builds still running, or failed, are redone here if needed
+                if not future.done() or future.exception() is not None:
+                    continue
+                if name in _seeded_artifacts:
+                    self._seeds[name] = future.result()
+                if same_data and name not in _model_artifacts:
+                    self._artifacts[name] = future
+                    self._sizes[name] = previous._sizes[name]
+            # Seeds the previous version never used pass on to this one
+            for name, value in previous._seeds.items():
+                self._seeds.setdefault(name, value)
+
+    def artifact(self, name, builder=None):
+        # Each artifact is built at most once per version. Concurrent callers
+        # wait on the same future, so nobody sees a half-built value.
+        with self._lock:
+            future = self._artifacts.get(name)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._artifacts[name] = future
+        if owner:
+            try:
+                value = (builder or _builders[name])(self)
+                # Caches such as ExportCache grow after they are built, so
+                # anything reporting its own nbytes is measured on demand
+                size = value if hasattr(value, 'nbytes') else estimate_nbytes(value)
+                with self._lock:
+                    self._sizes[name] = size
+                future.set_result(value)
+            except BaseException as e:
+                # Drop the failed build so the next caller can retry it
+                with self._lock:
+                    self._artifacts.pop(name, None)
+                future.set_exception(e)
+        return future.result()
+
+    def seed(self, name):
+        """The previous version's value of a seeded artifact, for its builder to reuse; None if there is none."""
+        with self._lock:
+            return self._seeds.pop(name, None)
+
+    def built(self, name):
+        """Whether artifact name is ready, without waiting for or starting its build."""
+        with self._lock:
+            future = self._artifacts.get(name)
+        return future is not None and future.done() and future.exception() is None
+
+    def retire(self):
+        self.retired = True
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the frame and the artifacts built so far."""
+        with self._lock:
+            sizes = list(self._sizes.values())
+        return self._df_nbytes + sum(int(size.nbytes) if hasattr(size, 'nbytes') else size for size in sizes)
+
+    def warm(self):
+        """Build every registered artifact now instead of in the background."""
+        for name in _eager():
+            try:
+                self.artifact(name)
+            except ArtifactUnavailable:
+                pass
+        return self
+
+
+def register(name, builder, uses_model=False, lazy=False, seeded=False):
+    """Register an artifact to be prebuilt whenever a new version is published.
+
+    Pass uses_model for artifacts that must be rebuilt when the model changes,
+    lazy for ones too costly to build before anyone asks for them, and seeded
+    for ones whose builder reuses the previous version's value via seed().
+    """
+    _builders[name] = builder
+    for flag, names in ((uses_model, _model_artifacts), (lazy, _lazy_artifacts), (seeded, _seeded_artifacts)):
+        if flag:
+            names.add(name)
+        else:
+            names.discard(name)
+
+
+def _eager():
+    return [name for name in list(_builders) if name not in _lazy_artifacts]
+
+
+def _prebuild(ds, name):
+    # Versions replaced while their builds were queued are not worth finishing
+    if not ds.retired:
+        try:
+            ds.artifact(name)
+        except ArtifactUnavailable:
+            pass
+
+
+def prebuild(ds):
+    """Queue every registered artifact of a newly published version."""
+    for name in _eager():
+        _executor.submit(_prebuild, ds, name)
+    return ds
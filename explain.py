@@ -0,0 +1,243 @@
+import math
+import threading
+
+import numpy as np
+
+import inference
+from dataset import FEATURE_COLUMNS, PASS_THRESHOLD, ArtifactUnavailable, estimate_nbytes
+
+# Rows explained per vectorized pass; bounds the per-level work arrays
+CHUNK_ROWS = 256
+
+# Risk factors listed per student in the at-risk report
+TOP_FACTORS = 3
+
+# Recommendation rules from generate_tip() in Data.ipynb and main.py:
+# (column, tip applies below, tip, dashboard icon)
+TIP_RULES = [
+    ('Attendance_Percentage', 60, 'Improve attendance.', '📌'),
+    ('Internal_Assessment_1', 15, 'Focus on Internal 1 topics.', '📝'),
+    ('Participation_Score', 5, 'Engage more in class.', '🙋‍♂️'),
+]
+ON_TRACK = ("You're on track!", '🎯')
+
+
+class ExplainError(ArtifactUnavailable, ValueError):
+    pass
+
+
+# Tips -------------------------------------------------------------------------
+
+def tip_codes(df):
+    """One bit per rule in TIP_RULES for every student, set where the tip applies."""
+    codes = np.zeros(len(df), dtype=np.uint8)
+    for bit, (column, limit, _, _) in enumerate(TIP_RULES):
+        codes |= (df[column].to_numpy(dtype=np.float64) < limit).astype(np.uint8) << bit
+    return codes
+
+
+def tips_for(code, icons=False):
+    tips = [f'{icon} {tip}' if icons else tip
+            for bit, (_, _, tip, icon) in enumerate(TIP_RULES) if int(code) >> bit & 1]
+    if not tips:
+        tip, icon = ON_TRACK
+        tips = [f'{icon} {tip}' if icons else tip]
+    return tips
+
+
+# Tree attributions ------------------------------------------------------------
+
+def _subset_weights(n_features):
+    """K[p, S, i]: how v(S) enters feature i's Shapley value when a row matches pattern p.
+
+    A leaf counts towards v(S) only if the row satisfies its constraints on
+    every feature in S, i.e. S is a subset of the row's pattern p.
+    """
+    subsets = 1 << n_features
+    sizes = np.array([bin(s).count('1') for s in range(subsets)])
+    weight = np.array([math.factorial(k) * math.factorial(n_features - k - 1) / math.factorial(n_features)
+                       for k in range(n_features)])
+    signed = np.zeros((subsets, n_features))
+    for s in range(subsets):
+        for i in range(n_features):
+            signed[s, i] = weight[sizes[s] - 1] if s >> i & 1 else -weight[sizes[s]]
+    covered = np.array([[(s & p) == s for s in range(subsets)] for p in range(subsets)])
+    return covered[:, :, None] * signed[None, :, :]
+
+
+class TreeExplainer:
+    """Exact path-dependent Shapley values for a compiled forest.
+
+    This is the value function of TreeSHAP: v(S) follows the row down
+    splits on features in S and averages over both children, weighted by
+    training cover, elsewhere. With only five features, each leaf's share
+    of v(S) is precomputed for all 32 subsets and every pattern of which
+    of its path constraints a row meets. Explaining a batch is then one
+    level-by-level walk of all trees that tracks each row's pattern per
+    node, plus one table lookup per reached leaf.
+    """
+
+    def __init__(self, forest):
+        self.forest = forest
+        n_features = forest.n_features_in_
+        n_trees = len(forest.roots)
+        cover = np.concatenate([tree.weighted_n_node_samples for tree in forest.trees]).astype(np.float64)
+        nodes = np.arange(len(forest.left))
+        self.is_leaf = forest.left == nodes
+
+        # Product of cover ratios along each leaf's path, per split feature
+        leaves, ratios = [], []
+        frontier, ratio = forest.roots, np.ones((n_trees, n_features))
+        while len(frontier):
+            leaf = self.is_leaf[frontier]
+            leaves.append(frontier[leaf])
+            ratios.append(ratio[leaf])
+            parents, ratio = frontier[~leaf], ratio[~leaf]
+            feature = forest.feature[parents]
+            children = []
+            for child in (forest.left[parents], forest.right[parents]):
+                scaled = ratio.copy()
+                scaled[np.arange(len(parents)), feature] *= cover[child] / cover[parents]
+                children.append((child, scaled))
+            frontier = np.concatenate([child for child, _ in children])
+            ratio = np.concatenate([scaled for _, scaled in children])
+        leaves, ratios = np.concatenate(leaves), np.concatenate(ratios)
+
+        # C[l, S]: leaf l's share of v(S) for a row inside all its constraints on S
+        subsets = 1 << n_features
+        C = np.empty((len(leaves), subsets))
+        for s in range(subsets):
+            outside = [j for j in range(n_features) if not s >> j & 1]
+            C[:, s] = forest.value[leaves] * np.prod(ratios[:, outside], axis=1) / n_trees
+        self.expected_value = float(C[:, 0].sum())
+
+        K = _subset_weights(n_features)
+        table = (C @ K.transpose(1, 0, 2).reshape(subsets, -1)).reshape(len(leaves), subsets, n_features)
+        # One contiguous (leaf, pattern) table per feature for cheap gathers
+        self._table = np.ascontiguousarray(table.transpose(2, 0, 1).reshape(n_features, -1))
+        self._leaf_index = np.full(len(nodes), -1, dtype=np.intp)
+        self._leaf_index[leaves] = np.arange(len(leaves))
+        self._subsets = subsets
+
+    @classmethod
+    def from_model(cls, model):
+        forest = model if isinstance(model, inference.CompiledForest) else inference.compile_model(model)
+        if forest is None:
+            raise ExplainError('Explanations need a scaler + random forest model')
+        return cls(forest)
+
+    def _explain(self, X, out):
+        # Work arrays are (node, row) so gathers along nodes copy whole rows
+        forest = self.forest
+        X = np.ascontiguousarray(X.T)
+        frontier = forest.roots
+        pattern = np.full((len(frontier), X.shape[1]), self._subsets - 1, dtype=np.uint8)
+        while len(frontier):
+            leaf = self.is_leaf[frontier]
+            if leaf.any():
+                cells = pattern[leaf] + (self._leaf_index[frontier[leaf]] * self._subsets)[:, None]
+                for i, table in enumerate(self._table):
+                    out[i] += table[cells].sum(axis=0)
+            parents, pattern = frontier[~leaf], pattern[~leaf]
+            feature = forest.feature[parents]
+            go_left = X[feature] <= forest.threshold[parents][:, None]
+            bit = (np.uint8(1) << feature.astype(np.uint8))[:, None]
+            frontier = np.concatenate([forest.left[parents], forest.right[parents]])
+            pattern = np.concatenate([pattern & ~(~go_left * bit), pattern & ~(go_left * bit)])
+
+    def shap_values(self, X):
+        """Per-feature contributions; each row sums to its prediction minus expected_value."""
+        forest = self.forest
+        X = forest._inputs(X)
+        scaled = ((X - forest.mean) / forest.scale).astype(np.float32)
+        out = np.zeros((X.shape[1], len(X)), dtype=np.float64)
+        for start in range(0, len(X), CHUNK_ROWS):
+            self._explain(scaled[start:start + CHUNK_ROWS], out[:, start:start + CHUNK_ROWS])
+        return out.T
+
+
+class Attributions:
+    """Contributions of one dataset version's rows, explained when first asked for.
+
+    Rows are keyed by their feature values, so a version that replaces
+    `previous` under the same explainer reuses what it explained for rows
+    that did not change.
+    """
+
+    def __init__(self, explainer, previous=None):
+        self.explainer = explainer
+        self.expected_value = explainer.expected_value
+        self._memo = {}
+        self._inherited = previous._memo if previous is not None and previous.explainer is explainer else {}
+        self._lock = threading.Lock()
+
+    def shap_values(self, X):
+        """Like TreeExplainer.shap_values, but only rows not seen before are explained."""
+        X = self.explainer.forest._inputs(X)
+        keys = [row.tobytes() for row in X]
+        missing = {}
+        with self._lock:
+            for row, key in enumerate(keys):
+                if key not in self._memo:
+                    value = self._inherited.get(key)
+                    if value is None:
+                        missing.setdefault(key, row)
+                    else:
+                        self._memo[key] = value
+        if missing:
+            values = self.explainer.shap_values(X[list(missing.values())])
+            with self._lock:
+                self._memo.update(zip(missing, values))
+        with self._lock:
+            return np.array([self._memo[key] for key in keys]).reshape(len(X), X.shape[1])
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return estimate_nbytes(self._memo)
+
+
+# Reports ----------------------------------------------------------------------
+
+def student_explanation(student, prediction, contributions, code, base_value):
+    return {
+        'Student_ID': str(student['Student_ID']),
+        'Name': str(student['Name']),
+        'predicted_score': float(prediction),
+        'prediction': 'Pass' if prediction >= PASS_THRESHOLD else 'Fail',
+        'base_value': base_value,
+        'contributions': {col: float(value) for col, value in zip(FEATURE_COLUMNS, contributions)},
+        'tips': tips_for(code)
+    }
+
+
+def at_risk_report(df, predictions, contributions_of, codes):
+    """Students predicted to fail, lowest score first, with what pulls them down.
+
+    contributions_of(positions) returns the attributions of just those rows.
+    """
+    positions = np.flatnonzero(predictions < PASS_THRESHOLD)
+    positions = positions[np.argsort(predictions[positions], kind='stable')]
+    contributions = contributions_of(positions).reshape(len(positions), len(FEATURE_COLUMNS))
+    factors = np.argsort(contributions, axis=1, kind='stable')[:, :TOP_FACTORS]
+    ids = df['Student_ID'].astype(str).to_numpy()[positions] if 'Student_ID' in df.columns \
+        else np.full(len(positions), None)
+    names = df['Name'].astype(str).to_numpy()[positions]
+    tips = [tips_for(code) for code in range(1 << len(TIP_RULES))]
+
+    students = []
+    for row, position in enumerate(positions):
+        students.append({
+            'Student_ID': ids[row],
+            'Name': names[row],
+            'predicted_score': float(predictions[position]),
+            'risk_factors': [{'feature': FEATURE_COLUMNS[j], 'contribution': float(contributions[row, j])}
+                             for j in factors[row] if contributions[row, j] < 0],
+            'tips': tips[codes[position]]
+        })
+    return {
+        'threshold': PASS_THRESHOLD,
+        'total_students': len(df),
+        'at_risk_count': len(students),
+        'students': students
+    }
@@ -0,0 +1,158 @@
+import threading
+import zlib
+from collections import OrderedDict
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # Parquet and Arrow exports are optional
+    pa = None
+
+# Rows written per CSV chunk / Parquet row group / Arrow record batch
+CHUNK_ROWS = 50_000
+
+# Distinct exports (format + query) kept per dataset version
+CACHE_ENTRIES = 8
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'csv.gz': ('application/gzip', 'csv.gz'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.file', 'arrow')
+}
+
+ARROW_FORMATS = ('parquet', 'arrow')
+
+
+class ExportError(ValueError):
+    pass
+
+
+class ExportCache:
+    """Small LRU of finished export bodies for one dataset version."""
+
+    def __init__(self, size=CACHE_ENTRIES):
+        self._size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return sum(len(body) for body in self._entries.values())
+
+
+class _Drain:
+    """Write-only file object whose buffered bytes are handed out as they are written."""
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def writable(self):
+        return True
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def check_format(fmt):
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format: {fmt}. Use one of: {', '.join(FORMATS)}")
+    if fmt in ARROW_FORMATS and pa is None:
+        raise ExportError(f'{fmt} export requires pyarrow to be installed')
+    return FORMATS[fmt]
+
+
+def _chunks(df, positions):
+    for start in range(0, len(positions), CHUNK_ROWS):
+        yield df.iloc[positions[start:start + CHUNK_ROWS]]
+
+
+def _csv(df, positions):
+    header = True
+    for chunk in _chunks(df, positions):
+        yield chunk.to_csv(index=False, header=header).encode('utf-8')
+        header = False
+    if header:
+        yield df.head(0).to_csv(index=False).encode('utf-8')
+
+
+def _gzip(parts):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for part in parts:
+        data = compressor.compress(part)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _arrow(df, positions, fmt):
+    schema = pa.Schema.from_pandas(df.head(0), preserve_index=False)
+    sink = _Drain()
+    if fmt == 'parquet':
+        writer = pa.parquet.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_file(sink, schema)
+    with writer:
+        for chunk in _chunks(df, positions):
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            if fmt == 'parquet':
+                writer.write_table(table)
+            else:
+                writer.write_table(table, max_chunksize=CHUNK_ROWS)
+            yield sink.take()
+    yield sink.take()
+
+
+def stream(df, positions, fmt):
+    """Yield the selected rows encoded as fmt, one chunk at a time."""
+    if fmt == 'csv':
+        return _csv(df, positions)
+    if fmt == 'csv.gz':
+        return _gzip(_csv(df, positions))
+    return _arrow(df, positions, fmt)
+
+
+def cached_stream(cache, key, parts):
+    """Pass parts through, keeping the body once it has been fully sent."""
+    sent = []
+    for part in parts:
+        if part:
+            sent.append(part)
+            yield part
+    cache.put(key, b''.join(sent))
@@ -65,9 +65,13 @@ const Students = () => {
 
   const downloadData = async () => {
     try {
-      const response = await axios.get('http://localhost:5000/download')
-      alert(response.data.message)
-      // In a real app, you would trigger a file download here
+      const response = await axios.get('http://localhost:5000/download', { responseType: 'blob' })
+      const url = URL.createObjectURL(response.data)
+      const link = document.createElement('a')
+      link.href = url
+      link.download = 'student_data.csv'
+      link.click()
+      URL.revokeObjectURL(url)
     } catch (error) {
       console.error('Error downloading data:', error)
     }
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+# Batches up to this size are walked in NumPy; beyond it the per-call
+# overhead of each tree's compiled apply() is cheaper than the extra gathers.
+SMALL_BATCH_ROWS = 32
+
+# Largest difference from sklearn accepted when checking a compiled model
+TOLERANCE = 1e-9
+
+
+class CompiledForest:
+    """A fitted StandardScaler + forest regressor flattened into NumPy arrays.
+
+    All trees share one set of node arrays. Leaves point back at themselves,
+    so small batches take the same fixed number of steps down every tree at
+    once in NumPy. Larger batches walk each tree with its compiled apply()
+    and gather leaf values from the flat arrays. Either way the inputs are
+    compared as float32 like sklearn does, and tree outputs are summed in
+    estimator order, so predictions match model.predict.
+    """
+
+    def __init__(self, mean, scale, feature, threshold, left, right, missing_left, value, roots,
+                 depth, trees, feature_names=None):
+        self.mean = mean
+        self.scale = scale
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.trees = trees
+        self.feature_names_in_ = feature_names
+        self.n_features_in_ = len(mean)
+
+    def _inputs(self, X):
+        if isinstance(X, pd.DataFrame) and self.feature_names_in_ is not None \
+                and list(X.columns) != list(self.feature_names_in_):
+            X = X[list(self.feature_names_in_)]
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f'Expected {self.n_features_in_} features per row, got shape {X.shape}')
+        return X
+
+    def _leaves(self, X):
+        rows = np.arange(len(X))
+        node = np.repeat(self.roots[:, None], len(X), axis=1)
+        has_missing = np.isnan(X).any()
+        for _ in range(self.depth):
+            x = X[rows, self.feature[node]]
+            go_left = x <= self.threshold[node]
+            if has_missing:
+                go_left = np.where(np.isnan(x), self.missing_left[node], go_left)
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict(self, X):
+        X = self._inputs(X)
+        scaled = ((X - self.mean) / self.scale).astype(np.float32)
+        if len(X) <= SMALL_BATCH_ROWS:
+            tree_values = self.value[self._leaves(scaled)]
+        else:
+            tree_values = (self.value[tree.apply(scaled) + root] for tree, root in zip(self.trees, self.roots))
+        total = np.zeros(len(X), dtype=np.float64)
+        for values in tree_values:
+            total += values
+        return total / len(self.roots)
+
+
+def _split(model):
+    # Returns (scaler or None, forest) for the pipelines we know how to compile
+    steps = model.steps if isinstance(model, Pipeline) else [(None, model)]
+    if len(steps) > 2:
+        return None
+    *head, (_, forest) = steps
+    scaler = head[0][1] if head else None
+    if scaler is not None and not isinstance(scaler, StandardScaler):
+        return None
+    if not isinstance(forest, (RandomForestRegressor, ExtraTreesRegressor)) or forest.n_outputs_ != 1:
+        return None
+    return scaler, forest
+
+
+def compile_model(model):
+    """Compile a fitted model, or return None if its shape is not supported."""
+    parts = _split(model)
+    if parts is None:
+        return None
+    scaler, forest = parts
+
+    n_features = forest.n_features_in_
+    mean = np.zeros(n_features)
+    scale = np.ones(n_features)
+    if scaler is not None:
+        if scaler.with_mean:
+            mean = scaler.mean_.astype(np.float64)
+        if scaler.with_std:
+            scale = scaler.scale_.astype(np.float64)
+
+    trees = [estimator.tree_ for estimator in forest.estimators_]
+    features, thresholds, lefts, rights, missing, values, roots = [], [], [], [], [], [], []
+    offset = 0
+    depth = 0
+    for tree in trees:
+        nodes = np.arange(tree.node_count)
+        leaf = tree.children_left == -1
+        roots.append(offset)
+        features.append(np.where(leaf, 0, tree.feature))
+        thresholds.append(tree.threshold)
+        lefts.append(np.where(leaf, nodes, tree.children_left) + offset)
+        rights.append(np.where(leaf, nodes, tree.children_right) + offset)
+        missing.append(getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=np.uint8)).astype(bool))
+        values.append(tree.value[:, 0, 0])
+        depth = max(depth, tree.max_depth)
+        offset += tree.node_count
+
+    return CompiledForest(
+        mean, scale,
+        np.concatenate(features).astype(np.intp),
+        np.concatenate(thresholds).astype(np.float64),
+        np.concatenate(lefts).astype(np.intp),
+        np.concatenate(rights).astype(np.intp),
+        np.concatenate(missing),
+        np.concatenate(values).astype(np.float64),
+        np.asarray(roots, dtype=np.intp),
+        depth,
+        trees,
+        getattr(model, 'feature_names_in_', None)
+    )
+
+
+def optimize(model, probe=None):
+    """Swap in the compiled evaluator when it reproduces model.predict, else keep sklearn."""
+    compiled = compile_model(model)
+    if compiled is None:
+        return model
+    if probe is None:
+        # Random rows spread around the training data exercise both sides of most splits
+        rng = np.random.default_rng(0)
+        probe = compiled.mean + compiled.scale * rng.normal(scale=2, size=(256, compiled.n_features_in_))
+    if compiled.feature_names_in_ is not None:
+        probe = pd.DataFrame(probe, columns=compiled.feature_names_in_)
+    if not np.allclose(compiled.predict(probe), model.predict(probe), rtol=0, atol=TOLERANCE):
+        return model
+    return compiled
@@ -0,0 +1,189 @@
+import numpy as np
+import pandas as pd
+
+from dataset import FEATURE_COLUMNS
+
+ID_COLUMN = 'Student_ID'
+TEXT_COLUMNS = ['Student_ID', 'Name']
+INTEGER_COLUMNS = ['Internal_Assessment_1', 'Internal_Assessment_2', 'Participation_Score', 'Final_Exam_Score']
+FLOAT_COLUMNS = ['Attendance_Percentage', 'Previous_Semester_Grade']
+
+# Numbers are parsed as floats so validation can report bad rows before the
+# integer columns are narrowed back to int64. Optional ones with gaps, such
+# as the Final_Exam_Score of students added mid-term, become nullable Int64.
+COLUMN_DTYPES = {
+    **{col: str for col in TEXT_COLUMNS},
+    **{col: 'float64' for col in INTEGER_COLUMNS + FLOAT_COLUMNS}
+}
+
+REQUIRED_COLUMNS = ['Name'] + FEATURE_COLUMNS
+
+# Upper bounds for columns with a fixed scale; everything numeric must be >= 0
+MAX_VALUES = {'Attendance_Percentage': 100}
+
+MODES = ('replace', 'append', 'upsert')
+CHUNK_ROWS = 50_000
+
+# How many offending rows to list in a validation error
+MAX_REPORTED_ROWS = 5
+
+
+class IngestError(ValueError):
+    pass
+
+
+def _read_chunks(source, chunk_rows):
+    try:
+        reader = pd.read_csv(source, dtype=COLUMN_DTYPES, chunksize=chunk_rows)
+    except pd.errors.EmptyDataError:
+        raise IngestError('CSV file is empty!')
+
+    start = 0
+    with reader:
+        while True:
+            try:
+                chunk = next(reader)
+            except StopIteration:
+                return
+            except ValueError as e:
+                raise IngestError(f'Could not parse rows after line {start + 1}: {e}')
+            # CSV line numbers: the header is line 1
+            chunk.index = pd.RangeIndex(start + 2, start + 2 + len(chunk))
+            start += len(chunk)
+            yield chunk
+
+
+def _report(column, problem, lines):
+    shown = ', '.join(map(str, lines[:MAX_REPORTED_ROWS]))
+    more = f' and {len(lines) - MAX_REPORTED_ROWS} more' if len(lines) > MAX_REPORTED_ROWS else ''
+    return IngestError(f'{column} {problem} on line(s) {shown}{more}')
+
+
+def validate_chunk(chunk):
+    for col in REQUIRED_COLUMNS + [ID_COLUMN]:
+        if col in chunk.columns and chunk[col].isna().any():
+            raise _report(col, 'is missing', chunk.index[chunk[col].isna()].tolist())
+
+    for col in INTEGER_COLUMNS + FLOAT_COLUMNS:
+        if col not in chunk.columns:
+            continue
+        values = chunk[col].to_numpy()
+        present = ~np.isnan(values)
+        out_of_range = present & ((values < 0) | (values > MAX_VALUES.get(col, np.inf)))
+        if out_of_range.any():
+            raise _report(col, 'is out of range', chunk.index[out_of_range].tolist())
+        if col in INTEGER_COLUMNS:
+            fractional = present & (values != np.floor(values))
+            if fractional.any():
+                raise _report(col, 'must be a whole number', chunk.index[fractional].tolist())
+
+
+def _narrow(df):
+    # Integer columns go back to int64, or to Int64 where validation allowed gaps
+    for col in INTEGER_COLUMNS:
+        if col not in df.columns:
+            continue
+        column = df[col]
+        if column.dtype.kind == 'f' or isinstance(column.dtype, pd.api.extensions.ExtensionDtype):
+            df[col] = column.astype('Int64' if column.isna().any() else 'int64')
+    return df.reset_index(drop=True)
+
+
+def load_csv(source, chunk_rows=CHUNK_ROWS):
+    """Read a full cohort CSV chunk by chunk, validating rows as they arrive."""
+    chunks = []
+    for chunk in _read_chunks(source, chunk_rows):
+        if not chunks:
+            missing = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
+            if missing:
+                raise IngestError('CSV file missing required columns!')
+        validate_chunk(chunk)
+        chunks.append(chunk)
+    if not sum(map(len, chunks)):
+        raise IngestError('CSV file has no rows!')
+    return _narrow(pd.concat(chunks, ignore_index=True))
+
+
+def _widen(column):
+    # Patch a full-width copy: the stored column may be narrowed to int8 or
+    # dictionary-encoded, neither of which can take arbitrary new values.
+    # Integers widen to Int64 so an update may also clear an optional score.
+    if column.dtype.kind in 'iu':
+        return column.astype('Int64')
+    if column.dtype.kind == 'f':
+        return column.astype(np.float64)
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.astype(object)
+    return column.copy()
+
+
+def _upsert(ds, source, chunk_rows):
+    base = ds.df
+    positions = ds.artifact('id_index')
+    # Copy-on-write per column: untouched columns stay shared with the
+    # previous version, updated ones are copied once and patched in place.
+    patched = {}
+    new_chunks = []
+    updated = 0
+
+    for chunk in _read_chunks(source, chunk_rows):
+        if ID_COLUMN not in chunk.columns:
+            raise IngestError(f'Upsert requires a {ID_COLUMN} column!')
+        unknown = [col for col in chunk.columns if col not in base.columns]
+        if unknown:
+            raise IngestError(f"Unknown columns for upsert: {', '.join(unknown)}")
+        validate_chunk(chunk)
+
+        # Same normalization as analytics.id_index
+        keys = chunk[ID_COLUMN].str.strip().str.upper()
+        found = keys.map(positions)
+        existing = found.notna().to_numpy()
+
+        if existing.any():
+            rows = found[existing].to_numpy(dtype=np.int64)
+            for col in chunk.columns.drop(ID_COLUMN):
+                if col not in patched:
+                    patched[col] = _widen(base[col])
+                values = chunk.loc[existing, col]
+                if patched[col].dtype.kind in 'iuf':
+                    values = values.astype(patched[col].dtype)
+                patched[col].iloc[rows] = values.array
+            updated += int(existing.sum())
+
+        if not existing.all():
+            new_rows = chunk.loc[~existing]
+            missing = [col for col in REQUIRED_COLUMNS if col not in new_rows.columns]
+            if missing:
+                raise _report(', '.join(missing), 'is required for new students', new_rows.index.tolist())
+            new_chunks.append(new_rows.assign(_key=keys[~existing]))
+
+    df = base.copy(deep=False)
+    for col, values in patched.items():
+        df[col] = values
+
+    inserted = 0
+    if new_chunks:
+        new_rows = pd.concat(new_chunks).drop_duplicates(subset='_key', keep='last').drop(columns='_key')
+        df = pd.concat([df, new_rows], ignore_index=True)
+        inserted = len(new_rows)
+
+    return _narrow(df), {'updated': updated, 'inserted': inserted}
+
+
+def ingest(ds, source, mode='replace', chunk_rows=CHUNK_ROWS):
+    """Build the next version of the data from an uploaded CSV.
+
+    replace swaps in the uploaded cohort, append adds its rows to the
+    current data and upsert updates students by Student_ID, adding the ones
+    it does not know. Returns the new frame and a summary of the changes.
+    """
+    if mode not in MODES:
+        raise IngestError(f"Unknown upload mode: {mode}. Use one of: {', '.join(MODES)}")
+
+    if mode == 'upsert':
+        return _upsert(ds, source, chunk_rows)
+
+    df = load_csv(source, chunk_rows)
+    if mode == 'append':
+        return _narrow(pd.concat([ds.df, df], ignore_index=True)), {'updated': 0, 'inserted': len(df)}
+    return df, {'updated': 0, 'inserted': len(df)}
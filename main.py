@@ -1,25 +1,91 @@
 import streamlit as st
 import pandas as pd
-import joblib
 import numpy as np
 import plotly.express as px
 
+import dataset
+import explain
+import inference
+import ingest
+import models
+import store
+from analytics import name_index, normalize_name, predict_cohort, prefix_index, prefix_search
+
 st.set_page_config(page_title="Student Dashboard", layout="wide")
 
-# Function to generate smart tips
-def generate_tip(student_data):
-    tips = []
-    if student_data["Attendance_Percentage"] < 60:
-        tips.append("📌 Improve attendance.")
-    if student_data["Internal_Assessment_1"] < 15:
-        tips.append("📝 Focus on Internal 1 topics.")
-    if student_data["Participation_Score"] < 5:
-        tips.append("🙋‍♂️ Engage more in class.")
-    return " | ".join(tips) if tips else "🎯 You're on track!"
-
-# Load model and data
-model = joblib.load("model_pipeline.pkl")
-df = pd.read_csv("student_performance_60.csv")
+# Streamlit reruns this script on every interaction, so the model and data are
+# cached resources and everything derived from the data is keyed by its
+# content hash. A new store version (e.g. after an upload) only misses the
+# entries for the new data; the model stays loaded. The model is the API's
+# serving version, so a retrain or rollback reaches the dashboard too, and
+# everything derived from predictions is also keyed by that version.
+@st.cache_resource(max_entries=2)
+def load_model(version):
+    return inference.optimize(models.load(version))
+
+@st.cache_resource(max_entries=2)
+def load_data(version):
+    data = store.load(name=version)
+    return data, dataset.content_hash(data)
+
+@st.cache_resource(max_entries=4)
+def cohort_predictions(data_hash, model_version, _df):
+    predictions = predict_cohort(load_model(model_version), _df)
+    predictions.flags.writeable = False
+    return predictions
+
+@st.cache_resource(max_entries=4)
+def student_lookup(data_hash, _df):
+    return name_index(_df), prefix_index(_df["Name"])
+
+@st.cache_resource(max_entries=4)
+def cohort_tips(data_hash, _df):
+    return explain.tip_codes(_df)
+
+# The uploader keeps its file across reruns, so parse, validate and encode
+# each upload once rather than on every interaction
+@st.cache_resource(max_entries=2)
+def parse_upload(file_id, _uploaded_file):
+    upload = ingest.load_csv(_uploaded_file)
+    return upload, upload.to_csv(index=False).encode('utf-8')
+
+@st.cache_data(max_entries=4)
+def cohort_summary(predictions_key, _df, _predictions):
+    return round(_df["Attendance_Percentage"].mean(), 2), int((_predictions >= 15).sum()), len(_df)
+
+@st.cache_data(max_entries=64)
+def performance_chart(data_hash, position, color_scale, _student_data):
+    chart_df = pd.DataFrame({
+        "Metrics": ["Internal 1", "Internal 2", "Attendance", "Previous Grade", "Participation"],
+        "Values": [
+            _student_data["Internal_Assessment_1"],
+            _student_data["Internal_Assessment_2"],
+            _student_data["Attendance_Percentage"],
+            _student_data["Previous_Semester_Grade"],
+            _student_data["Participation_Score"]
+        ]
+    })
+    return px.bar(chart_df, x="Metrics", y="Values", color="Values", text="Values", height=350, color_continuous_scale=color_scale)
+
+@st.cache_data(max_entries=8)
+def prediction_charts(predictions_key, dark_mode, _predictions):
+    # Prediction distribution histogram
+    pred_df = pd.DataFrame({"Prediction Score": _predictions})
+    histogram = px.histogram(pred_df, x="Prediction Score", nbins=20, title="Prediction Score Distribution", color_discrete_sequence=["#636EFA"] if not dark_mode else ["#00CC96"])
+
+    # Pass/Fail count pie chart
+    pass_fail_counts = pd.Series(_predictions >= 15).value_counts().rename({True: "Pass", False: "Fail"})
+    pie = px.pie(names=pass_fail_counts.index, values=pass_fail_counts.values, title="Pass vs Fail Prediction", color=pass_fail_counts.index,
+                 color_discrete_map={"Pass": "#00CC96", "Fail": "#EF553B"})
+    return histogram, pie
+
+# Load data
+df, data_hash = load_data(store.convert_once("student_performance_60.csv"))
+model_version = models.current_version() or models.import_once("model_pipeline.pkl")
+predictions = cohort_predictions(data_hash, model_version, df)
+predictions_key = dataset.content_key((data_hash, model_version))
+positions_by_name, search_index = student_lookup(data_hash, df)
+tip_codes = cohort_tips(data_hash, df)
 
 # Light/Dark mode toggle
 if "dark_mode" not in st.session_state:
@@ -62,47 +128,36 @@ st.markdown("Analyze student progress, identify risks, and provide recommendatio
 
 # Add overall stats
 col1, col2, col3 = st.columns(3)
+avg_attendance, pass_count, dataset_size = cohort_summary(predictions_key, df, predictions)
 with col1:
-    avg_attendance = round(df["Attendance_Percentage"].mean(), 2)
     st.metric("📅 Avg. Attendance (%)", avg_attendance)
 with col2:
-    pass_count = sum((model.predict(df[[
-        "Internal_Assessment_1", "Internal_Assessment_2",
-        "Attendance_Percentage", "Previous_Semester_Grade",
-        "Participation_Score"
-    ]]) >= 15))
     st.metric("✅ Students Predicted to Pass", pass_count)
 with col3:
-    st.metric("📈 Dataset Size", len(df))
+    st.metric("📈 Dataset Size", dataset_size)
 
 st.markdown("---")
 
 # Student selection
 # Search bar
 search_term = st.text_input("🔍 Search Student by Name:")
-filtered_df = df[df["Name"].str.contains(search_term, case=False, na=False)] if search_term else df
+student_names = df["Name"].iloc[prefix_search(search_index, search_term)] if search_term else df["Name"]
 
 # Student selection
-selected_student = st.selectbox("🎓 Select a Student", filtered_df["Name"])
-
-student_data = df[df["Name"] == selected_student].iloc[0]
+selected_student = st.selectbox("🎓 Select a Student", student_names)
+if selected_student is None:
+    st.warning("No students match your search.")
+    st.stop()
 
+position = positions_by_name[normalize_name(selected_student)]
+student_data = df.iloc[position]
 
-student_data = df[df["Name"] == selected_student].iloc[0]
-features = [[
-    student_data["Internal_Assessment_1"],
-    student_data["Internal_Assessment_2"],
-    student_data["Attendance_Percentage"],
-    student_data["Previous_Semester_Grade"],
-    student_data["Participation_Score"]
-]]
-
-prediction = model.predict(features)[0]
+prediction = predictions[position]
 result = "✅ Pass" if prediction >= 15 else "❌ Fail"
 
 # Display result with colors
 st.subheader(f"🎯 Prediction Result: {'🟢' if prediction >= 15 else '🔴'} {result}")
-st.markdown(f"**💡 Recommendation:** {generate_tip(student_data)}")
+st.markdown(f"**💡 Recommendation:** {' | '.join(explain.tips_for(tip_codes[position], icons=True))}")
 
 # Expandable section for detailed data
 with st.expander("📋 View Student Details"):
@@ -110,51 +165,40 @@ with st.expander("📋 View Student Details"):
 
 # Charts (Bar)
 st.markdown("### 📊 Performance Breakdown")
-chart_df = pd.DataFrame({
-    "Metrics": ["Internal 1", "Internal 2", "Attendance", "Previous Grade", "Participation"],
-    "Values": [
-        student_data["Internal_Assessment_1"],
-        student_data["Internal_Assessment_2"],
-        student_data["Attendance_Percentage"],
-        student_data["Previous_Semester_Grade"],
-        student_data["Participation_Score"]
-    ]
-})
-fig = px.bar(chart_df, x="Metrics", y="Values", color="Values", text="Values", height=350, color_continuous_scale=chart_color_scale)
+fig = performance_chart(data_hash, position, chart_color_scale, student_data)
 st.plotly_chart(fig, use_container_width=True)
 
 # Additional prediction graphs
 st.markdown("### 📈 Prediction Insights")
 
-# Prediction distribution histogram
-predictions = model.predict(df[[
-    "Internal_Assessment_1", "Internal_Assessment_2",
-    "Attendance_Percentage", "Previous_Semester_Grade",
-    "Participation_Score"
-]])
-pred_df = pd.DataFrame({"Prediction Score": predictions})
-fig2 = px.histogram(pred_df, x="Prediction Score", nbins=20, title="Prediction Score Distribution", color_discrete_sequence=["#636EFA"] if not st.session_state.dark_mode else ["#00CC96"])
+fig2, fig3 = prediction_charts(predictions_key, st.session_state.dark_mode, predictions)
 st.plotly_chart(fig2, use_container_width=True)
-
-# Pass/Fail count pie chart
-pass_fail_counts = pd.Series(predictions >= 15).value_counts().rename({True: "Pass", False: "Fail"})
-fig3 = px.pie(names=pass_fail_counts.index, values=pass_fail_counts.values, title="Pass vs Fail Prediction", color=pass_fail_counts.index,
-              color_discrete_map={"Pass": "#00CC96", "Fail": "#EF553B"})
 st.plotly_chart(fig3, use_container_width=True)
 
 # Upload new data
 st.markdown("---")
 uploaded_file = st.file_uploader("📤 Upload updated student data (.csv)", type=["csv"])
 if uploaded_file is not None:
-    df = pd.read_csv(uploaded_file)
+    # The store is shared with the API's workers, so uploads are validated
+    # like /upload before anything is published
+    try:
+        df, upload_csv = parse_upload(uploaded_file.file_id, uploaded_file)
+    except ingest.IngestError as e:
+        st.error(f"❌ {e}")
+        st.stop()
     st.success("✅ Data updated successfully! Refresh the page to reload.")
-    # Save the updated DataFrame to a new CSV file
-    df.to_csv("updated_student_performance.csv", index=False)
-    st.write("Updated data saved as 'updated_student_performance.csv'.")    
+    # Convert the upload into the columnar store shared with the API. The
+    # uploader keeps its file across reruns, so only save each upload once.
+    if st.session_state.get("saved_upload") != uploaded_file.file_id:
+        # Hold the store lock so an API upsert in progress is not overwritten mid-cycle
+        with store.locked():
+            store.save(df)
+        st.session_state.saved_upload = uploaded_file.file_id
+    st.write("Updated data saved to the student data store.")
     # Add a download button for the updated CSV
     st.download_button(
         label="Download Updated Data",
-        data=df.to_csv(index=False).encode('utf-8'),
+        data=upload_csv,
         file_name="updated_student_performance.csv",
         mime="text/csv"
     )
@@ -0,0 +1,470 @@
+import collections
+import itertools
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+
+# Prometheus metric names are prefixed so they group together on a dashboard
+PREFIX = 'student_api'
+
+# Request latency buckets in seconds, from cached bodies up to full exports
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Seconds between stack samples while profiling a request
+PROFILE_INTERVAL = 0.005
+
+# Finished profiles kept for /debug/profile/<id>
+PROFILE_KEEP = 16
+
+# Seconds between snapshots of a worker's counters when metrics are shared
+SHARE_INTERVAL = 1.0
+
+_registry = []
+_local = threading.local()
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = f'{PREFIX}_{name}'
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def render(self, shared=()):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples(shared))
+        return '\n'.join(lines)
+
+    def _snapshot(self):
+        return []
+
+    def _clear(self):
+        pass
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _snapshot(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def _clear(self):
+        with self._lock:
+            self._values = {}
+
+    def _samples(self, shared=()):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in shared:
+            key = tuple(key)
+            values[key] = values.get(key, 0) + value
+        return [f'{self.name}{_labels(self.labels, key)} {_number(value)}' for key, value in sorted(values.items())]
+
+
+class Gauge(_Metric):
+    """A gauge read from a callback at scrape time.
+
+    The callback returns a number, or a {label values: number} dict for a
+    labelled gauge; None leaves the gauge out of the scrape. Gauges are not
+    shared: with several workers they are read in the one answering.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, help, read, labels=()):
+        super().__init__(name, help, labels)
+        self._read = read
+
+    def _samples(self, shared=()):
+        value = self._read()
+        if value is None:
+            return []
+        values = value if isinstance(value, dict) else {(): value}
+        return [f'{self.name}{_labels(self.labels, key)} {_number(value)}' for key, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, (None, 0.0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._values[key] = (counts, total + value)
+
+    def _snapshot(self):
+        with self._lock:
+            return [[list(key), [list(counts), total]] for key, (counts, total) in self._values.items()]
+
+    def _clear(self):
+        with self._lock:
+            self._values = {}
+
+    def _samples(self, shared=()):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in shared:
+            key = tuple(key)
+            mine, mine_total = values.get(key, ([0] * len(counts), 0.0))
+            values[key] = ([a + b for a, b in zip(mine, counts)], mine_total + total)
+        lines = []
+        for key, (counts, total) in sorted(values.items()):
+            for bound, count in zip(self.buckets + (math.inf,), itertools.accumulate(counts)):
+                labels = _labels(self.labels + ('le',), key + (_number(float(bound)),))
+                lines.append(f'{self.name}_bucket{labels} {count}')
+            lines.append(f'{self.name}_sum{_labels(self.labels, key)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.labels, key)} {sum(counts)}')
+        return lines
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format.
+
+    When metrics are shared, counters and histograms add up every process
+    sharing the directory, so any worker answers a scrape with the totals.
+    """
+    shared = collections.defaultdict(list)
+    for snapshot in _shared_snapshots():
+        for name, entries in snapshot.items():
+            shared[name].extend(entries)
+    return '\n'.join(metric.render(shared.get(metric.name, ())) for metric in _registry) + '\n'
+
+
+REQUESTS = Counter('requests_total', 'HTTP requests by route, method and status.',
+                   ('route', 'method', 'status'))
+REQUEST_SECONDS = Histogram('request_duration_seconds', 'Time to handle and send a response, by route.',
+                            ('route', 'method'))
+PHASE_SECONDS = Histogram('phase_duration_seconds', 'Time spent in named phases of request handling.',
+                          ('route', 'phase'))
+INFERENCE_CALLS = Counter('inference_calls_total', 'Model predict calls, by caller.', ('source',))
+ROWS_SCORED = Counter('rows_scored_total', 'Rows passed to the model, by caller.', ('source',))
+COHORT_EVICTIONS = Counter('cohort_evictions_total', 'Cohorts dropped from memory to stay within budget.')
+
+
+# Sharing across worker processes --------------------------------------------
+
+_shared_dir = None
+_shared_file = None
+
+
+def _snapshot_path():
+    # A pid alone could be reused by a later worker and overwrite an exited one's totals
+    return os.path.join(_shared_dir, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json')
+
+
+def share(directory):
+    """Merge counters and histograms with worker processes through directory.
+
+    Call it in the parent before forking, then worker_started() in each
+    worker. Every process writes snapshots of its own values to a file of
+    its own and render() adds up the others' files. Files of exited workers
+    are kept so totals never go backwards. Finished profiles are written
+    to the directory too.
+    """
+    global _shared_dir, _shared_file
+    os.makedirs(directory, exist_ok=True)
+    _shared_dir = directory
+    _shared_file = _snapshot_path()
+    # The parent only records start-up work, so one snapshot covers it
+    flush()
+
+
+def worker_started(interval=SHARE_INTERVAL):
+    """Start sharing from a freshly forked worker; scrapes may lag it by up to interval seconds."""
+    global _shared_file
+    if _shared_dir is None:
+        return
+    # The parent's snapshot already holds what the worker inherited
+    for metric in _registry:
+        metric._clear()
+    _shared_file = _snapshot_path()
+    flush()
+    threading.Thread(target=_flush_periodically, args=(interval,), name='metrics-share', daemon=True).start()
+
+
+def _flush_periodically(interval):
+    while True:
+        time.sleep(interval)
+        flush()
+
+
+def flush():
+    """Write this process's snapshot now, e.g. before a worker exits."""
+    if _shared_dir is None:
+        return
+    snapshot = {metric.name: metric._snapshot() for metric in _registry if metric.kind != 'gauge'}
+    staging = f'{_shared_file}.{uuid.uuid4().hex[:8]}.tmp'
+    with open(staging, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(staging, _shared_file)
+
+
+def _shared_snapshots():
+    if _shared_dir is None:
+        return []
+    snapshots = []
+    for entry in os.listdir(_shared_dir):
+        path = os.path.join(_shared_dir, entry)
+        # This process's own values are read from memory, which is never stale
+        if not entry.endswith('.json') or path == _shared_file:
+            continue
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (FileNotFoundError, ValueError):
+            continue
+    return snapshots
+
+
+# Spans -----------------------------------------------------------------------
+
+@contextmanager
+def span(phase):
+    """Time a phase such as 'pandas', 'model' or 'serialize'.
+
+    Durations go to the phase histogram under the current request's route
+    (or '-' outside a request) and into the request's Server-Timing header.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(phase, time.perf_counter() - start)
+
+
+def timed(phase, chunks):
+    """Wrap a response generator so the time spent producing chunks counts as phase."""
+    elapsed = 0.0
+    iterator = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            break
+        finally:
+            elapsed += time.perf_counter() - start
+        yield chunk
+    _record(phase, elapsed)
+
+
+def _record(phase, seconds):
+    phases = getattr(_local, 'phases', None)
+    if phases is not None:
+        phases[phase] += seconds
+    PHASE_SECONDS.observe(seconds, route=getattr(_local, 'route', None) or '-', phase=phase)
+
+
+def begin(route):
+    _local.route = route
+    _local.phases = collections.defaultdict(float)
+
+
+def end():
+    phases = getattr(_local, 'phases', None) or {}
+    _local.route = None
+    _local.phases = None
+    return dict(phases)
+
+
+def server_timing(phases):
+    return ', '.join(f'{phase};dur={seconds * 1e3:.3f}' for phase, seconds in phases.items())
+
+
+# Sampling profiler -----------------------------------------------------------
+
+class Profiler:
+    """Sample one thread's stack at a fixed interval from a helper thread.
+
+    Samples are aggregated as collapsed stacks ("outer;inner;leaf count"),
+    which flamegraph.pl, speedscope and most flame graph viewers read.
+    """
+
+    def __init__(self, thread_id=None, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._sampler.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            self.stacks[';'.join(f'{entry.name} ({entry.filename}:{entry.lineno})' for entry in stack)] += 1
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+_profiles = collections.OrderedDict()
+_profiles_lock = threading.Lock()
+
+# Finished profiles are also written here when metrics are shared, so any
+# worker can serve a profile another worker recorded
+PROFILE_DIR = 'profiles'
+PROFILE_ID = re.compile(r'^[0-9a-f]{12}$')
+
+
+def next_profile_id():
+    # Random rather than counted, so pre-forked workers never hand out the same id
+    return uuid.uuid4().hex[:12]
+
+
+def _profile_path(profile_id):
+    return os.path.join(_shared_dir, PROFILE_DIR, f'{profile_id}.txt')
+
+
+def keep_profile(profile_id, profiler):
+    collapsed = profiler.collapsed()
+    with _profiles_lock:
+        _profiles[profile_id] = collapsed
+        while len(_profiles) > PROFILE_KEEP:
+            _profiles.popitem(last=False)
+    if _shared_dir is None:
+        return
+    path = _profile_path(profile_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    staging = f'{path}.{uuid.uuid4().hex[:8]}.tmp'
+    with open(staging, 'w') as f:
+        f.write(collapsed)
+    os.replace(staging, path)
+    _prune_profiles(os.path.dirname(path))
+
+
+def _prune_profiles(directory):
+    entries = []
+    for entry in os.listdir(directory):
+        if entry.endswith('.txt'):
+            try:
+                entries.append((os.path.getmtime(os.path.join(directory, entry)), entry))
+            except FileNotFoundError:
+                continue
+    for _, entry in sorted(entries)[:-PROFILE_KEEP]:
+        try:
+            os.remove(os.path.join(directory, entry))
+        except FileNotFoundError:
+            pass
+
+
+def get_profile(profile_id):
+    with _profiles_lock:
+        collapsed = _profiles.get(profile_id)
+    if collapsed is not None or _shared_dir is None or not PROFILE_ID.match(profile_id):
+        return collapsed
+    try:
+        with open(_profile_path(profile_id)) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+# Flask integration -----------------------------------------------------------
+
+def instrument(app, profile_header='X-Profile'):
+    """Record latency, status and phase timings for every request to app.
+
+    When app.config['PROFILE_REQUESTS'] is set, a request carrying the
+    profile header is sampled while it runs; the response's X-Profile-Id
+    names the collapsed stacks served by /debug/profile/<id>.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _start():
+        g.metrics_start = time.perf_counter()
+        g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+        begin(g.metrics_route)
+        g.metrics_profiler = None
+        if app.config.get('PROFILE_REQUESTS') and request.headers.get(profile_header):
+            g.metrics_profiler = Profiler().start()
+
+    @app.after_request
+    def _finish(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        route, method, status = g.metrics_route, request.method, response.status_code
+        phases = end()
+        if phases:
+            response.headers['Server-Timing'] = server_timing(phases)
+        profiler = g.pop('metrics_profiler', None)
+        if profiler is not None:
+            # Streamed bodies are produced after this hook, so keep sampling until close
+            profile_id = response.headers['X-Profile-Id'] = next_profile_id()
+
+        def _close():
+            REQUESTS.inc(route=route, method=method, status=status)
+            REQUEST_SECONDS.observe(time.perf_counter() - start, route=route, method=method)
+            if profiler is not None:
+                keep_profile(profile_id, profiler.stop())
+            _local.route = None
+
+        response.call_on_close(_close)
+        # Streamed chunks still report their phases under this route
+        _local.route = route
+        return response
@@ -0,0 +1,89 @@
+import json
+import os
+import shutil
+import time
+import uuid
+
+import joblib
+
+import store
+
+# On-disk layout, versioned like the student data store:
+#   <root>/CURRENT            name of the serving model version
+#   <root>/<version>/model.pkl
+#   <root>/<version>/meta.json
+MODEL_DIR = os.environ.get('STUDENT_MODEL_DIR', 'student_models')
+MODEL_FILE = 'model.pkl'
+META_FILE = 'meta.json'
+
+# Earlier versions kept on disk for rollback
+KEEP_MODELS = 5
+
+
+class RollbackError(LookupError):
+    pass
+
+
+def _write(root, write_model, meta):
+    name = f'{time.time_ns()}-{uuid.uuid4().hex[:8]}'
+    staging = os.path.join(root, f'.{name}.tmp')
+    os.makedirs(staging)
+    write_model(os.path.join(staging, MODEL_FILE))
+    with open(os.path.join(staging, META_FILE), 'w') as f:
+        json.dump({**meta, 'created': time.time()}, f, indent=2)
+    os.rename(staging, os.path.join(root, name))
+    return name
+
+
+def save(model, meta, root=MODEL_DIR):
+    """Write a fitted model as a new version and make it current. Returns the version name."""
+    os.makedirs(root, exist_ok=True)
+    with store.locked(root):
+        name = _write(root, lambda path: joblib.dump(model, path), meta)
+        store.point_to(root, name)
+        store.prune(root, name, KEEP_MODELS)
+    return name
+
+
+def import_once(path, root=MODEL_DIR):
+    """Return the current version name, copying the pickle at path in as the first version."""
+    os.makedirs(root, exist_ok=True)
+    with store.locked(root):
+        name = store.current_version(root)
+        if name is None:
+            name = _write(root, lambda dest: shutil.copyfile(path, dest), {'source': path})
+            store.point_to(root, name)
+    return name
+
+
+def current_version(root=MODEL_DIR):
+    """Name of the serving model version, or None before the first import."""
+    return store.current_version(root)
+
+
+def history(root=MODEL_DIR):
+    """Version names on disk, oldest first."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(entry for entry in os.listdir(root)
+                  if not entry.startswith('.') and os.path.isdir(os.path.join(root, entry)))
+
+
+def meta(name, root=MODEL_DIR):
+    with open(os.path.join(root, name, META_FILE)) as f:
+        return {'version': name, **json.load(f)}
+
+
+def load(name, root=MODEL_DIR):
+    return joblib.load(os.path.join(root, name, MODEL_FILE))
+
+
+def rollback(root=MODEL_DIR):
+    """Point CURRENT at the newest version older than the serving one. Returns its name."""
+    with store.locked(root):
+        current = store.current_version(root)
+        earlier = [name for name in history(root) if current is None or name < current]
+        if not earlier:
+            raise RollbackError('No earlier model version to roll back to')
+        store.point_to(root, earlier[-1])
+    return earlier[-1]
@@ -0,0 +1,170 @@
+import io
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+from dataset import FEATURE_COLUMNS, PASS_THRESHOLD
+
+# Optional pass-through column so callers can match results to their rows
+ID_COLUMN = 'Student_ID'
+
+# Rows per encoded chunk when streaming batch results back
+STREAM_CHUNK_ROWS = 1000
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json'
+}
+
+
+class BatchError(ValueError):
+    pass
+
+
+def _columnar(frame):
+    missing = [col for col in FEATURE_COLUMNS if col not in frame.columns]
+    if missing:
+        raise BatchError(f"Missing required columns: {', '.join(missing)}")
+
+    block = np.empty((len(frame), len(FEATURE_COLUMNS)), dtype=np.float64)
+    for i, col in enumerate(FEATURE_COLUMNS):
+        values = pd.to_numeric(frame[col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        bad = np.flatnonzero(~np.isfinite(values))
+        if bad.size:
+            rows = ', '.join(map(str, bad[:10].tolist()))
+            raise BatchError(f"Column {col} has missing or non-numeric values at rows {rows}")
+        block[:, i] = values
+
+    ids = None
+    if ID_COLUMN in frame.columns:
+        # Rows without an ID get None: no Student_ID in their JSON results, an empty CSV field
+        present = frame[ID_COLUMN].notna()
+        if present.any():
+            ids = frame[ID_COLUMN].astype('string').astype(object).where(present, None).tolist()
+    return block, ids
+
+
+def batch_format(content_type):
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in ('text/csv', 'application/csv'):
+        return 'csv'
+    if content_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        return 'ndjson'
+    return 'json'
+
+
+def parse_batch(body, fmt):
+    """Parse a JSON array, NDJSON or CSV body into a (rows x features) float block."""
+    try:
+        if fmt == 'csv':
+            frame = pd.read_csv(io.BytesIO(body), usecols=lambda col: col in FEATURE_COLUMNS or col == ID_COLUMN)
+        elif fmt == 'ndjson':
+            frame = pd.DataFrame([json.loads(line) for line in body.splitlines() if line.strip()])
+        else:
+            rows = json.loads(body)
+            if not isinstance(rows, list):
+                raise BatchError('Expected a JSON array of students')
+            frame = pd.DataFrame(rows)
+    except BatchError:
+        raise
+    except (ValueError, TypeError) as e:
+        raise BatchError(f'Could not parse request body: {e}')
+
+    if frame.empty:
+        raise BatchError('No rows to score')
+    return _columnar(frame)
+
+
+def predict_block(model, block):
+    # Keep the feature names the pipeline was fitted with
+    return np.asarray(model.predict(pd.DataFrame(block, columns=FEATURE_COLUMNS)), dtype=float)
+
+
+def _result(score, student_id=None):
+    result = {'prediction': "Pass" if score >= PASS_THRESHOLD else "Fail", 'score': float(score)}
+    if student_id is not None:
+        result[ID_COLUMN] = student_id
+    return result
+
+
+def stream_results(scores, ids, fmt):
+    """Yield encoded results in chunks, matching the request format."""
+    columns = ['prediction', 'score'] + ([ID_COLUMN] if ids is not None else [])
+    ids = ids if ids is not None else [None] * len(scores)
+
+    if fmt == 'csv':
+        yield ','.join(columns) + '\n'
+    elif fmt == 'json':
+        yield '['
+
+    for start in range(0, len(scores), STREAM_CHUNK_ROWS):
+        chunk = zip(scores[start:start + STREAM_CHUNK_ROWS], ids[start:start + STREAM_CHUNK_ROWS])
+        results = [_result(score, student_id) for score, student_id in chunk]
+        if fmt == 'csv':
+            yield pd.DataFrame(results, columns=columns).to_csv(index=False, header=False)
+        elif fmt == 'ndjson':
+            yield ''.join(json.dumps(r) + '\n' for r in results)
+        else:
+            yield (',' if start else '') + ','.join(json.dumps(r) for r in results)
+
+    if fmt == 'json':
+        yield ']'
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-row predictions into one model call.
+
+    Rows submitted within `window` seconds of the first queued row (or until
+    `max_batch` rows are waiting) are scored together on a worker thread.
+    """
+
+    def __init__(self, predict, window, max_batch=64):
+        self._predict = predict
+        self._window = window
+        self._max_batch = max_batch
+        self._start()
+        if hasattr(os, 'register_at_fork'):
+            # A forked worker inherits the batcher but not its thread
+            os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name='predict-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, row):
+        future = Future()
+        self._queue.put((np.asarray(row, dtype=np.float64), future))
+        return future
+
+    def _collect(self):
+        items = [self._queue.get()]
+        deadline = time.monotonic() + self._window
+        while len(items) < self._max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            try:
+                scores = self._predict(np.vstack([row for row, _ in items]))
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            for (_, future), score in zip(items, scores):
+                future.set_result(float(score))
@@ -0,0 +1,150 @@
+"""Serve the API from pre-forked worker processes.
+
+    python serve.py                        # one worker per CPU on port 5000
+    python serve.py --workers 4 --host 0.0.0.0 --port 8000
+
+The parent imports app.py once, so the compiled model and every derived
+artifact of the default cohort are built before forking and shared
+copy-on-write; the data itself is memory-mapped from the store. Each
+worker accepts from the same listening socket and handles requests on
+threads. An /upload handled by any worker replaces its cohort store's
+CURRENT pointer, and every worker republishes from it before serving that
+cohort again. Other cohorts load lazily in each worker.
+
+/metrics answers from any worker with counters and histograms summed over
+all of them (see metrics.share); gauges describe the answering worker.
+/debug/profile/<id> serves a profile whichever worker recorded it.
+`app.py` is still the single-process debug server; on platforms without
+fork() this script serves from one process too.
+
+Workers run werkzeug's threaded server, the one `app.run` uses, so the
+API needs no dependency beyond Flask. It does not buffer slow clients,
+limit request sizes or terminate TLS, so anything reachable from outside
+should sit behind a reverse proxy such as nginx that does.
+"""
+import argparse
+import gc
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+from werkzeug.serving import make_server
+
+# A worker that dies sooner than this after starting is not restarted, so a
+# broken build fails loudly instead of forking in a loop
+MIN_WORKER_SECONDS = 1.0
+
+
+def _serve(api, sock, host, port):
+    server = make_server(host, port, api.app, threaded=True, fd=sock.fileno())
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def _stop(signum, frame):
+    raise KeyboardInterrupt
+
+
+def _spawn(api, sock, host, port):
+    pid = os.fork()
+    if pid:
+        return pid
+    code = 0
+    try:
+        signal.signal(signal.SIGTERM, _stop)
+        signal.signal(signal.SIGINT, _stop)
+        api.metrics.worker_started()
+        _serve(api, sock, host, port)
+    except KeyboardInterrupt:
+        pass
+    except BaseException:
+        import traceback
+        traceback.print_exc()
+        code = 1
+    finally:
+        try:
+            api.metrics.flush()
+        finally:
+            os._exit(code)
+
+
+def run(workers, host, port):
+    import app as api
+
+    # Build every artifact now so workers inherit them instead of each recomputing
+    api.registry.get(api.cohorts.DEFAULT_COHORT).current().warm()
+
+    sock = socket.create_server((host, port), backlog=128)
+    sock.set_inheritable(True)
+    print(f' * Serving on http://{host}:{port} with {workers} worker(s)', file=sys.stderr)
+
+    if workers <= 1 or not hasattr(os, 'fork'):
+        try:
+            _serve(api, sock, host, port)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    # Per-process metric snapshots, merged whenever a worker is scraped
+    metrics_dir = tempfile.mkdtemp(prefix='student-metrics-')
+    api.metrics.share(metrics_dir)
+
+    # Keep the collector from touching (and so copying) the inherited objects
+    gc.freeze()
+
+    children = {}
+    stopping = False
+
+    def _shutdown(signum, frame):
+        # os.wait() resumes after a handler returns, so signal the workers from here
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+
+    for _ in range(workers):
+        children[_spawn(api, sock, host, port)] = time.monotonic()
+
+    status = 0
+    while children:
+        try:
+            pid, code = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        print(f' * Worker {pid} exited with status {code}', file=sys.stderr)
+        if time.monotonic() - started < MIN_WORKER_SECONDS:
+            _shutdown(None, None)
+            status = 1
+            continue
+        children[_spawn(api, sock, host, port)] = time.monotonic()
+    sock.close()
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args(argv)
+    return run(args.workers, args.host, args.port)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,255 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process serving only
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+import ingest
+
+# On-disk layout:
+#   <root>/CURRENT            name of the published version directory
+#   <root>/LOCK               flock()ed around read-modify-save cycles
+#   <root>/<version>/manifest.json
+#   <root>/<version>/<n>.npy  one file per numeric column or category codes
+#   <root>/<version>/<n>.categories.npy
+#   <root>/<version>/<n>.mask.npy        missing values of a nullable integer column
+# Columns are loaded with np.load(mmap_mode='r'), so every process reading
+# the same version shares the page cache instead of holding its own copy.
+STORE_DIR = os.environ.get('STUDENT_STORE_DIR', 'student_data')
+CURRENT_FILE = 'CURRENT'
+LOCK_FILE = 'LOCK'
+MANIFEST_FILE = 'manifest.json'
+
+# Older versions kept around for processes that still have them mapped
+KEEP_VERSIONS = 3
+
+INT_TYPES = [np.int8, np.int16, np.int32, np.int64]
+
+
+def _narrow_int(values):
+    for dtype in INT_TYPES:
+        info = np.iinfo(dtype)
+        if values.size == 0 or (values.min() >= info.min and values.max() <= info.max):
+            return values.astype(dtype)
+    return values
+
+
+def _narrow_float(values):
+    # float32 only when it round-trips exactly, so scores like 69.09 keep their value
+    narrow = values.astype(np.float32)
+    if np.array_equal(narrow.astype(np.float64), values, equal_nan=True):
+        return narrow
+    return values
+
+
+def _encode(series):
+    if isinstance(series.dtype, pd.api.extensions.ExtensionDtype) and series.dtype.kind in 'iu':
+        # Nullable integers: the values with gaps zeroed, plus the mask
+        mask = series.isna().to_numpy()
+        return 'masked', _narrow_int(series.to_numpy(dtype=np.int64, na_value=0)), mask
+    if series.dtype.kind in 'iu':
+        return 'numeric', _narrow_int(series.to_numpy()), None
+    if series.dtype.kind == 'f':
+        return 'numeric', _narrow_float(series.to_numpy(dtype=np.float64)), None
+    if series.dtype.kind == 'b':
+        return 'numeric', series.to_numpy(), None
+    categorical = series.astype('category')
+    categories = categorical.cat.categories.astype(str).to_numpy(dtype=str)
+    return 'category', np.asarray(categorical.cat.codes.to_numpy()), categories
+
+
+def _write_version(root, df):
+    # Nanosecond prefix keeps version names in publication order
+    name = f'{time.time_ns()}-{uuid.uuid4().hex[:8]}'
+    staging = os.path.join(root, f'.{name}.tmp')
+    os.makedirs(staging)
+
+    columns = []
+    for i, col in enumerate(df.columns):
+        kind, values, extra = _encode(df[col])
+        np.save(os.path.join(staging, f'{i}.npy'), values)
+        entry = {'name': str(col), 'kind': kind, 'file': f'{i}.npy', 'dtype': values.dtype.str}
+        if kind == 'category':
+            np.save(os.path.join(staging, f'{i}.categories.npy'), extra)
+            entry['categories'] = f'{i}.categories.npy'
+        elif kind == 'masked':
+            np.save(os.path.join(staging, f'{i}.mask.npy'), extra)
+            entry['mask'] = f'{i}.mask.npy'
+        columns.append(entry)
+
+    with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+        json.dump({'rows': len(df), 'columns': columns, 'created': time.time()}, f, indent=2)
+
+    os.rename(staging, os.path.join(root, name))
+    return name
+
+
+def point_to(root, name):
+    # Readers only ever see the old or the new pointer, never a partial one
+    pointer = os.path.join(root, CURRENT_FILE)
+    staging = f'{pointer}.{uuid.uuid4().hex[:8]}.tmp'
+    with open(staging, 'w') as f:
+        f.write(name)
+    os.replace(staging, pointer)
+
+
+def prune(root, current, keep):
+    versions = sorted(entry for entry in os.listdir(root)
+                      if not entry.startswith('.') and entry != current
+                      and os.path.isdir(os.path.join(root, entry)))
+    for name in versions[:max(len(versions) - (keep - 1), 0)]:
+        # Windows refuses to delete files another process still has mapped
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def save(df, root=STORE_DIR):
+    """Write df as a new version and publish it. Returns the version name."""
+    os.makedirs(root, exist_ok=True)
+    name = _write_version(root, df)
+    point_to(root, name)
+    prune(root, name, KEEP_VERSIONS)
+    return name
+
+
+def current_version(root=STORE_DIR):
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def pointer_stamp(root=STORE_DIR):
+    """A cheap fingerprint of CURRENT that changes whenever any process publishes."""
+    try:
+        stat = os.stat(os.path.join(root, CURRENT_FILE))
+    except FileNotFoundError:
+        return None
+    # point_to always replaces the file, so the inode changes even within one mtime tick
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+# Lock files this process holds. Their descriptors survive fork(), and a
+# long-lived child such as the training pool would otherwise keep a lock
+# held after the parent releases it, so children close their copies.
+_held = set()
+
+
+def _close_inherited():
+    for f in list(_held):
+        f.close()
+    _held.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_close_inherited)
+
+
+@contextmanager
+def locked(root=STORE_DIR):
+    """Hold the store's exclusive lock, across threads and processes.
+
+    Wrap read-modify-save cycles in it so two workers never derive a new
+    version from the same base.
+    """
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, LOCK_FILE), 'a') as f:
+        _held.add(f)
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            _held.discard(f)
+
+
+def try_lock(path):
+    """Lock path exclusively if nobody else holds it, without waiting.
+
+    Returns the open file holding the lock (pass it to unlock), or None.
+    The lock lasts until unlock or until this process exits, however it exits.
+    """
+    f = open(path, 'a+')
+    if fcntl is not None:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return None
+    _held.add(f)
+    return f
+
+
+def unlock(f):
+    _held.discard(f)
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+    f.close()
+
+
+class Follower:
+    """Follow a CURRENT pointer that other processes may move.
+
+    poll() calls load(name) when the pointer names a version other than
+    serving() returns; while the pointer is untouched it costs one stat().
+    """
+
+    def __init__(self, serving, load, root=STORE_DIR):
+        self.serving = serving
+        self.load = load
+        self.root = root
+        # Stamped before the caller loads anything, so a version saved in
+        # between is still picked up by the first poll
+        self._stamp = pointer_stamp(root)
+        self._lock = threading.Lock()
+
+    def poll(self):
+        stamp = pointer_stamp(self.root)
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            name = current_version(self.root)
+            if name is not None and name != self.serving():
+                self.load(name)
+            self._stamp = stamp
+
+
+def load(root=STORE_DIR, name=None):
+    """Map the given (default: current) version into a DataFrame without copying it."""
+    name = name or current_version(root)
+    if name is None:
+        raise FileNotFoundError(f'No published student data in {root}')
+    path = os.path.join(root, name)
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+
+    columns = {}
+    for entry in manifest['columns']:
+        values = np.load(os.path.join(path, entry['file']), mmap_mode='r')
+        if entry['kind'] == 'category':
+            categories = pd.Index(np.load(os.path.join(path, entry['categories'])))
+            values = pd.Categorical.from_codes(values, categories=categories, validate=False)
+        elif entry['kind'] == 'masked':
+            mask = np.load(os.path.join(path, entry['mask']), mmap_mode='r')
+            values = pd.arrays.IntegerArray(np.asarray(values), np.asarray(mask))
+        columns[entry['name']] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+def convert_once(csv_path, root=STORE_DIR):
+    """Return the current version name, converting csv_path into the store on first run."""
+    return current_version(root) or save(ingest.load_csv(csv_path), root)
@@ -0,0 +1,174 @@
+import base64
+import json
+
+import numpy as np
+
+from dataset import PASS_THRESHOLD, content_key
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Rows encoded per chunk when streaming an unpaginated selection
+STREAM_CHUNK_ROWS = 1000
+
+PAGINATION_PARAMS = ('limit', 'offset', 'cursor')
+
+
+class QueryError(ValueError):
+    pass
+
+
+class StaleCursorError(QueryError):
+    pass
+
+
+def query_key(args):
+    """Fingerprint of the selection a cursor pages through; the page size may change."""
+    return content_key(sorted((name, value) for name, value in args.items() if name not in PAGINATION_PARAMS))
+
+
+def encode_cursor(version, offset, query):
+    raw = json.dumps({'v': version, 'o': offset, 'q': query}).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor, version, query):
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        cursor_version, offset, cursor_query = state['v'], int(state['o']), state['q']
+    except (ValueError, KeyError, TypeError):
+        raise QueryError('Invalid cursor')
+    if cursor_query != query:
+        raise QueryError('cursor was issued for a different query; repeat its search, sort, filters and fields')
+    if cursor_version != version:
+        raise StaleCursorError('Student data changed since this cursor was issued; restart pagination')
+    return offset
+
+
+def _int_arg(args, name, default):
+    value = args.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise QueryError(f'{name} must be an integer')
+    if value < 0:
+        raise QueryError(f'{name} must not be negative')
+    return value
+
+
+def _name_lower(ds):
+    return ds.df['Name'].astype('string').str.lower().fillna('').reset_index(drop=True)
+
+
+def _sort_order(column, descending):
+    def build(ds):
+        values = ds.df[column].reset_index(drop=True)
+        return values.sort_values(ascending=not descending, kind='stable', na_position='last').index.to_numpy()
+    return build
+
+
+def is_paginated(args):
+    return any(name in args for name in PAGINATION_PARAMS)
+
+
+def select(ds, args, predictions=None):
+    """Resolve a /students query to row positions and the columns to return.
+
+    Supported arguments: fields, search, sort (prefix with '-' for
+    descending), min_<column>/max_<column> for numeric columns and
+    result=Pass|Fail against the model's predictions.
+    """
+    df = ds.df
+    columns = list(df.columns)
+
+    fields = columns
+    if args.get('fields'):
+        fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+        unknown = [field for field in fields if field not in columns]
+        if unknown:
+            raise QueryError(f"Unknown fields: {', '.join(unknown)}")
+
+    mask = np.ones(len(df), dtype=bool)
+
+    search = args.get('search', '').strip().lower()
+    if search:
+        names = ds.artifact('name_lower', _name_lower)
+        mask &= names.str.contains(search, regex=False).to_numpy(dtype=bool)
+
+    for name, value in args.items():
+        bound, _, column = name.partition('_')
+        if bound not in ('min', 'max') or not column:
+            continue
+        if column not in columns or df[column].dtype.kind not in 'iuf':
+            raise QueryError(f'Cannot filter on non-numeric column: {column}')
+        try:
+            threshold = float(value)
+        except ValueError:
+            raise QueryError(f'{name} must be a number')
+        values = df[column].to_numpy(dtype=float, na_value=np.nan)
+        mask &= values >= threshold if bound == 'min' else values <= threshold
+
+    result = args.get('result')
+    if result:
+        if result not in ('Pass', 'Fail') or predictions is None:
+            raise QueryError('result must be Pass or Fail')
+        passed = predictions >= PASS_THRESHOLD
+        mask &= passed if result == 'Pass' else ~passed
+
+    sort = args.get('sort')
+    if sort:
+        descending = sort.startswith('-')
+        column = sort.lstrip('-')
+        if column not in columns:
+            raise QueryError(f'Unknown sort column: {column}')
+        order = ds.artifact(f'order:{sort}', _sort_order(column, descending))
+        positions = order[mask[order]]
+    else:
+        positions = np.flatnonzero(mask)
+
+    return positions, fields
+
+
+def version_for(ds, args):
+    """The version a query's rows depend on: only result= filters read the model's predictions."""
+    return ds.version if args.get('result') else ds.data_version
+
+
+def page(ds, args, positions):
+    query = query_key(args)
+    offset = _int_arg(args, 'offset', 0)
+    if args.get('cursor'):
+        offset = decode_cursor(args['cursor'], version_for(ds, args), query)
+    limit = min(_int_arg(args, 'limit', DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE)
+
+    window = positions[offset:offset + limit]
+    end = offset + len(window)
+    return window, {
+        'total': int(len(positions)),
+        'offset': offset,
+        'limit': limit,
+        'next_cursor': encode_cursor(version_for(ds, args), end, query) if end < len(positions) else None
+    }
+
+
+def to_records(frame):
+    """Rows as dicts, with missing values (NaN, <NA>) as None so they encode as JSON null."""
+    if frame.isna().to_numpy().any():
+        frame = frame.astype(object).where(frame.notna(), None)
+    return frame.to_dict(orient='records')
+
+
+def records(df, positions, fields):
+    return to_records(df[fields].iloc[positions])
+
+
+def stream_records(df, positions, fields, dumps):
+    """Yield a JSON array of the selected rows a chunk at a time."""
+    yield '['
+    for start in range(0, len(positions), STREAM_CHUNK_ROWS):
+        chunk = dumps(records(df, positions[start:start + STREAM_CHUNK_ROWS], fields))[1:-1]
+        if chunk:
+            yield (',' if start else '') + chunk
+    yield ']'
@@ -0,0 +1,54 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Name pools are taken from the sample cohort so generated names look alike
+SAMPLE_CSV = "student_performance_60.csv"
+
+
+def _name_pools(source):
+    names = pd.read_csv(source, usecols=['Name'])['Name'].dropna().str.split(n=1)
+    first = sorted(set(names.str[0]))
+    last = sorted(set(names.str[1].dropna()))
+    return np.array(first, dtype=object), np.array(last, dtype=object)
+
+
+def generate(rows, seed=0, source=SAMPLE_CSV):
+    """Generate a cohort with the same columns and distributions as the sample CSV.
+
+    Scores are uniform over the sample's ranges, and Final_Exam_Score
+    follows the sample's near-linear relationship with the other columns.
+    Student IDs are unique at any size.
+    """
+    rng = np.random.default_rng(seed)
+    first, last = _name_pools(source)
+
+    internal_1 = rng.integers(0, 21, rows)
+    internal_2 = rng.integers(0, 21, rows)
+    attendance = rng.uniform(40, 100, rows).round(2)
+    previous_grade = rng.uniform(0.01, 20, rows).round(2)
+    participation = rng.integers(0, 11, rows)
+    final_exam = internal_1 + internal_2 + 0.3 * previous_grade + participation + rng.normal(0, 0.3, rows)
+
+    width = max(4, len(str(rows - 1)))
+    return pd.DataFrame({
+        'Student_ID': [f'STU{i:0{width}d}' for i in rng.permutation(rows)],
+        'Name': first[rng.integers(0, len(first), rows)] + ' ' + last[rng.integers(0, len(last), rows)],
+        'Internal_Assessment_1': internal_1,
+        'Internal_Assessment_2': internal_2,
+        'Attendance_Percentage': attendance,
+        'Previous_Semester_Grade': previous_grade,
+        'Participation_Score': participation,
+        'Final_Exam_Score': np.clip(final_exam.round(), 0, None).astype(np.int64)
+    })
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic student cohort CSV.')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('-o', '--output', default='synthetic_students.csv')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate(args.rows, args.seed).to_csv(args.output, index=False)
+    print(f'Wrote {args.rows} students to {args.output}')
@@ -0,0 +1,90 @@
+import io
+
+import pytest
+
+import cohorts
+import dataset
+import synthetic
+
+
+@pytest.fixture
+def frame():
+    return synthetic.generate(50, seed=5)
+
+
+@pytest.fixture(autouse=True)
+def cohort_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cohorts, 'COHORT_DIR', str(tmp_path))
+
+
+def _load(registry, name, df):
+    registry.get(name, create=True).save(df).warm()
+    return registry.get(name)
+
+
+def _loaded(registry):
+    return [cohort.name for cohort in registry.loaded()]
+
+
+def test_least_recently_used_cohorts_are_evicted_over_budget(frame):
+    size = _load(cohorts.Registry(lambda: 'm'), 'sizing', frame).nbytes
+    registry = cohorts.Registry(lambda: 'm', budget=size * 2.5)
+    evicted = _load(registry, 'a', frame).current()
+    for name in ('b', 'c'):
+        _load(registry, name, frame)
+    assert _loaded(registry) == ['b', 'c']
+    # Using b makes c the least recently used; a reloads from its store
+    registry.get('b')
+    reloaded = registry.get('a').current().warm()
+    registry.get('a')
+    assert _loaded(registry) == ['b', 'a']
+    assert reloaded is not evicted and reloaded.data_version == evicted.data_version
+
+
+def test_evicted_versions_are_retired(frame):
+    size = _load(cohorts.Registry(lambda: 'm'), 'sizing', frame).nbytes
+    registry = cohorts.Registry(lambda: 'm', budget=size * 1.5)
+    first = _load(registry, 'a', frame).current()
+    _load(registry, 'b', frame)
+    assert _loaded(registry) == ['b']
+    assert first.retired
+
+
+def test_the_cohort_being_served_is_never_evicted(frame):
+    registry = cohorts.Registry(lambda: 'm', budget=1)
+    _load(registry, 'a', frame)
+    assert _loaded(registry) == ['a']
+    _load(registry, 'b', frame)
+    assert _loaded(registry) == ['b']
+
+
+def test_discard_forgets_only_cohorts_without_data(frame):
+    registry = cohorts.Registry(lambda: 'm')
+    empty = registry.get('empty', create=True)
+    loaded = _load(registry, 'loaded', frame)
+    registry.discard(empty)
+    registry.discard(loaded)
+    assert set(registry._cohorts) == {'loaded'}
+    with pytest.raises(cohorts.CohortNotFound):
+        registry.get('empty')
+    assert 'empty' not in registry._cohorts
+
+
+def test_rejected_first_upload_leaves_no_cohort_behind():
+    import app as api
+    response = api.app.test_client().post(
+        '/cohorts/rejected/upload', data={'file': (io.BytesIO(b'Student_ID,Name\n'), 'students.csv')},
+        content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert 'rejected' not in api.registry._cohorts
+
+
+def test_seeded_artifacts_reuse_the_last_built_value(frame, monkeypatch):
+    for name in ('_builders', '_model_artifacts', '_lazy_artifacts', '_seeded_artifacts'):
+        monkeypatch.setattr(dataset, name, type(getattr(dataset, name))())
+    dataset.register('builds', lambda ds: (ds.seed('builds') or 0) + 1, lazy=True, seeded=True)
+    cohort = cohorts.Registry(lambda: 'm').get('seeded', create=True)
+    assert cohort.save(frame).warm().artifact('builds') == 1
+    # A version that never builds it hands the seed on to the next one
+    cohort.save(frame.head(10))
+    assert cohort.save(frame.head(20)).artifact('builds') == 2
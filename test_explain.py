@@ -0,0 +1,164 @@
+import itertools
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+import dataset
+import explain
+from dataset import FEATURE_COLUMNS, PASS_THRESHOLD
+
+
+@pytest.fixture(scope='module')
+def model():
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.uniform(0, 30, size=(200, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+    y = X['Internal_Assessment_1'] + 0.5 * X['Participation_Score'] * (X['Attendance_Percentage'] > 15)
+    forest = RandomForestRegressor(n_estimators=4, max_depth=4, random_state=0)
+    return make_pipeline(StandardScaler(), forest).fit(X, y)
+
+
+def _rows(n, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.uniform(-5, 35, size=(n, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+
+
+def _value(tree, x, subset, node=0):
+    """Path-dependent v(S): follow x on features in subset, otherwise average children by cover."""
+    left, right = tree.children_left[node], tree.children_right[node]
+    if left == -1:
+        return tree.value[node, 0, 0]
+    if tree.feature[node] in subset:
+        return _value(tree, x, subset, left if x[tree.feature[node]] <= tree.threshold[node] else right)
+    cover = tree.weighted_n_node_samples
+    return (cover[left] * _value(tree, x, subset, left) + cover[right] * _value(tree, x, subset, right)) / cover[node]
+
+
+def _brute_force_shapley(model, x):
+    scaled = model[0].transform(pd.DataFrame([x], columns=FEATURE_COLUMNS))[0].astype(np.float32)
+    trees = [estimator.tree_ for estimator in model[-1].estimators_]
+    n = len(FEATURE_COLUMNS)
+
+    def v(subset):
+        return np.mean([_value(tree, scaled, subset) for tree in trees])
+
+    phi = np.zeros(n)
+    for i in range(n):
+        others = [j for j in range(n) if j != i]
+        for size in range(n):
+            weight = math.factorial(size) * math.factorial(n - size - 1) / math.factorial(n)
+            for subset in itertools.combinations(others, size):
+                phi[i] += weight * (v(set(subset) | {i}) - v(set(subset)))
+    return phi, v(set())
+
+
+def test_shap_values_match_brute_force(model):
+    explainer = explain.TreeExplainer.from_model(model)
+    X = _rows(12, seed=2)
+    values = explainer.shap_values(X)
+    for row, x in zip(values, X.to_numpy()):
+        phi, base = _brute_force_shapley(model, x)
+        np.testing.assert_allclose(row, phi, rtol=0, atol=1e-10)
+        assert explainer.expected_value == pytest.approx(base, abs=1e-10)
+
+
+def test_shap_values_add_up_to_the_prediction(model):
+    explainer = explain.TreeExplainer.from_model(model)
+    # More rows than CHUNK_ROWS, so several chunks are explained
+    X = _rows(explain.CHUNK_ROWS * 2 + 7, seed=3)
+    values = explainer.shap_values(X)
+    assert values.shape == (len(X), len(FEATURE_COLUMNS))
+    np.testing.assert_allclose(values.sum(axis=1) + explainer.expected_value, model.predict(X), rtol=0, atol=1e-9)
+
+
+def test_single_rows_match_the_batch(model):
+    explainer = explain.TreeExplainer.from_model(model)
+    X = _rows(5, seed=4)
+    batch = explainer.shap_values(X)
+    for i in range(len(X)):
+        np.testing.assert_allclose(explainer.shap_values(X.iloc[[i]])[0], batch[i], rtol=0, atol=1e-12)
+
+
+def _counted(explainer, calls):
+    shap_values = explainer.shap_values
+
+    def counted(X):
+        calls.append(len(X))
+        return shap_values(X)
+
+    explainer.shap_values = counted
+    return shap_values
+
+
+def test_attributions_explain_each_row_once(model):
+    explainer = explain.TreeExplainer.from_model(model)
+    calls = []
+    shap_values = _counted(explainer, calls)
+    X = _rows(6, seed=5)
+    first = explain.Attributions(explainer)
+    np.testing.assert_allclose(first.shap_values(X.iloc[[1, 3]]), shap_values(X.iloc[[1, 3]]))
+    np.testing.assert_allclose(first.shap_values(X), shap_values(X))
+    assert calls == [2, 4]
+    # A newer version reuses rows it shares with the previous one, but not another model's
+    changed = X.copy()
+    changed.loc[0, 'Attendance_Percentage'] += 1
+    np.testing.assert_allclose(explain.Attributions(explainer, first).shap_values(changed), shap_values(changed))
+    assert calls == [2, 4, 1]
+    other_calls = []
+    other = explain.TreeExplainer.from_model(model)
+    _counted(other, other_calls)
+    explain.Attributions(other, first).shap_values(X)
+    assert other_calls == [6]
+    assert first.shap_values(X.iloc[[]]).shape == (0, len(FEATURE_COLUMNS))
+
+
+def test_unsupported_models_raise():
+    with pytest.raises(explain.ExplainError):
+        explain.TreeExplainer.from_model(StandardScaler())
+
+
+def test_warm_skips_attributions_of_models_that_cannot_be_explained(monkeypatch):
+    def attributions(ds):
+        return explain.TreeExplainer.from_model(StandardScaler())
+    monkeypatch.setattr(dataset, '_builders', {'attributions': attributions, 'rows': lambda ds: len(ds.df)})
+    ds = dataset.Dataset(pd.DataFrame({'Student_ID': ['S1']}), 1).warm()
+    assert ds.built('rows') and not ds.built('attributions')
+    with pytest.raises(explain.ExplainError):
+        ds.artifact('attributions')
+
+
+def test_tip_codes_and_tips():
+    df = pd.DataFrame({'Attendance_Percentage': [50, 90, 59.9], 'Internal_Assessment_1': [20, 10, 5],
+                       'Participation_Score': [9, 9, 4]})
+    codes = explain.tip_codes(df)
+    assert codes.tolist() == [1, 2, 7]
+    assert explain.tips_for(codes[0]) == ['Improve attendance.']
+    assert explain.tips_for(codes[2], icons=True) == ['📌 Improve attendance.', '📝 Focus on Internal 1 topics.',
+                                                      '🙋‍♂️ Engage more in class.']
+    assert explain.tips_for(0) == ["You're on track!"]
+
+
+def test_at_risk_report_orders_and_explains_failing_students():
+    df = pd.DataFrame({'Student_ID': ['S1', 'S2', 'S3'], 'Name': ['A', 'B', 'C']})
+    predictions = np.array([PASS_THRESHOLD - 1, PASS_THRESHOLD + 5, PASS_THRESHOLD - 3], dtype=float)
+    contributions = np.array([[-1, 2, -3, 0.5, 0],
+                              [1, 1, 1, 1, 1],
+                              [0.5, -0.25, 0, 0, -2]], dtype=float)
+    asked = []
+
+    def contributions_of(positions):
+        asked.append(positions.tolist())
+        return contributions[positions]
+
+    report = explain.at_risk_report(df, predictions, contributions_of, np.array([1, 0, 0], dtype=np.uint8))
+    # Only the failing students are explained
+    assert asked == [[2, 0]]
+    assert report['at_risk_count'] == 2
+    assert [student['Student_ID'] for student in report['students']] == ['S3', 'S1']
+    assert [factor['feature'] for factor in report['students'][0]['risk_factors']] == \
+        ['Participation_Score', 'Internal_Assessment_2']
+    assert report['students'][1]['tips'] == ['Improve attendance.']
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+import inference
+from dataset import FEATURE_COLUMNS
+
+
+@pytest.fixture(scope='module')
+def model():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.uniform(0, 100, size=(400, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+    y = X['Internal_Assessment_1'] * 0.3 + X['Attendance_Percentage'] * 0.1 + rng.normal(size=len(X))
+    return make_pipeline(StandardScaler(), RandomForestRegressor(n_estimators=20, random_state=0)).fit(X, y)
+
+
+def _rows(n, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.uniform(-10, 110, size=(n, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+
+
+@pytest.mark.parametrize('rows', [1, inference.SMALL_BATCH_ROWS, inference.SMALL_BATCH_ROWS + 1, 2000])
+def test_compiled_forest_matches_sklearn(model, rows):
+    compiled = inference.compile_model(model)
+    X = _rows(rows, seed=rows)
+    np.testing.assert_array_equal(compiled.predict(X), model.predict(X))
+
+
+def test_compiled_forest_matches_on_split_thresholds(model):
+    # Values sitting exactly on a threshold must take the same branch as sklearn
+    compiled = inference.compile_model(model)
+    tree = model[-1].estimators_[0].tree_
+    split = np.flatnonzero(tree.children_left != -1)[:inference.SMALL_BATCH_ROWS]
+    scaler = model[0]
+    X = np.tile(scaler.mean_, (len(split), 1))
+    X[np.arange(len(split)), tree.feature[split]] = \
+        tree.threshold[split] * scaler.scale_[tree.feature[split]] + scaler.mean_[tree.feature[split]]
+    X = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+    for block in (X, pd.concat([X] * 4, ignore_index=True)):
+        np.testing.assert_array_equal(compiled.predict(block), model.predict(block))
+
+
+def test_compiled_forest_reorders_named_columns(model):
+    compiled = inference.compile_model(model)
+    X = _rows(5, seed=1)
+    np.testing.assert_array_equal(compiled.predict(X[FEATURE_COLUMNS[::-1]]), model.predict(X))
+
+
+def test_compiled_forest_rejects_wrong_width(model):
+    with pytest.raises(ValueError):
+        inference.compile_model(model).predict(np.zeros((2, 3)))
+
+
+def test_optimize_falls_back_for_unsupported_models():
+    X = _rows(50, seed=2)
+    linear = make_pipeline(StandardScaler(), LinearRegression()).fit(X, X['Internal_Assessment_1'])
+    assert inference.compile_model(linear) is None
+    assert inference.optimize(linear) is linear
+
+
+def test_optimize_returns_compiled_forest(model):
+    assert isinstance(inference.optimize(model), inference.CompiledForest)
@@ -0,0 +1,143 @@
+import io
+
+import pandas as pd
+import pytest
+
+import dataset
+import ingest
+from analytics import id_index
+
+HEADER = ('Student_ID,Name,Internal_Assessment_1,Internal_Assessment_2,Attendance_Percentage,'
+          'Previous_Semester_Grade,Participation_Score,Final_Exam_Score')
+ROSTER = [
+    'STU1,Ada Lovelace,12,14,91.5,18.2,7,30',
+    'STU2,Alan Turing,9,11,55.0,12.0,4,14',
+    'STU3,Grace Hopper,17,16,78.25,16.5,9,33',
+]
+
+
+def _csv(*lines, header=HEADER):
+    return io.StringIO('\n'.join([header, *lines]) + '\n')
+
+
+def _current(lines=ROSTER):
+    ds = dataset.Dataset(ingest.load_csv(_csv(*lines)), 1)
+    # Upserts look students up through the version's ID index
+    ds.artifact('id_index', lambda ds: id_index(ds.df))
+    return ds
+
+
+def test_replace_narrows_integer_columns():
+    df, summary = ingest.ingest(None, _csv(*ROSTER), 'replace')
+    assert summary == {'updated': 0, 'inserted': 3}
+    assert df['Internal_Assessment_1'].dtype == 'int64'
+    assert df['Final_Exam_Score'].dtype == 'int64'
+    assert df['Attendance_Percentage'].tolist() == [91.5, 55.0, 78.25]
+
+
+def test_replace_keeps_missing_scores_as_nullable_integers():
+    df, _ = ingest.ingest(None, _csv(ROSTER[0], 'STU4,New Student,10,10,80,12,5,'), 'replace')
+    assert df['Final_Exam_Score'].dtype == 'Int64'
+    assert df['Final_Exam_Score'].tolist() == [30, pd.NA]
+
+
+def test_append_adds_rows_after_current_data():
+    df, summary = ingest.ingest(_current(), _csv('STU4,Katherine Johnson,15,15,99,19,8,35'), 'append')
+    assert summary == {'updated': 0, 'inserted': 1}
+    assert df['Student_ID'].tolist() == ['STU1', 'STU2', 'STU3', 'STU4']
+    assert df['Final_Exam_Score'].dtype == 'int64'
+
+
+def test_append_without_scores_keeps_existing_ones_integral():
+    header = HEADER.rsplit(',', 1)[0]
+    df, _ = ingest.ingest(_current(), _csv('STU4,Katherine Johnson,15,15,99,19,8', header=header), 'append')
+    assert df['Final_Exam_Score'].dtype == 'Int64'
+    assert df['Final_Exam_Score'].tolist() == [30, 14, 33, pd.NA]
+
+
+def test_upsert_updates_by_normalized_id_and_inserts_new_students():
+    body = _csv(' stu2 ,Alan Turing,10,12,65.0,12.0,5,', 'STU9,Katherine Johnson,15,15,99,19,8,35')
+    df, summary = ingest.ingest(_current(), body, 'upsert')
+    assert summary == {'updated': 1, 'inserted': 1}
+    assert len(df) == 4
+    assert df.loc[1, 'Attendance_Percentage'] == 65.0
+    assert df.loc[1, 'Internal_Assessment_1'] == 10
+    # A blank score clears it instead of failing the integer conversion
+    assert df['Final_Exam_Score'].tolist() == [30, pd.NA, 33, 35]
+    # Columns the upload does not mention are left alone
+    assert df.loc[0, 'Name'] == 'Ada Lovelace'
+
+
+def test_upsert_with_a_subset_of_columns():
+    df, summary = ingest.ingest(_current(), _csv('STU3,40', header='Student_ID,Final_Exam_Score'), 'upsert')
+    assert summary == {'updated': 1, 'inserted': 0}
+    assert df['Final_Exam_Score'].tolist() == [30, 14, 40]
+    assert df['Final_Exam_Score'].dtype == 'int64'
+
+
+def test_upsert_keeps_the_last_row_for_a_repeated_new_id():
+    body = _csv('STU9,First Try,1,1,50,5,1,10', 'STU9,Second Try,2,2,60,6,2,20')
+    df, summary = ingest.ingest(_current(), body, 'upsert', chunk_rows=1)
+    assert summary['inserted'] == 1
+    assert df['Name'].tolist()[-1] == 'Second Try'
+
+
+def test_upsert_requires_an_id_column():
+    with pytest.raises(ingest.IngestError, match='Student_ID'):
+        ingest.ingest(_current(), _csv('Ada Lovelace,40', header='Name,Final_Exam_Score'), 'upsert')
+
+
+def test_upsert_rejects_unknown_columns():
+    with pytest.raises(ingest.IngestError, match='Unknown columns for upsert: Nickname'):
+        ingest.ingest(_current(), _csv('STU1,Ada', header='Student_ID,Nickname'), 'upsert')
+
+
+def test_upsert_reports_new_students_missing_required_columns():
+    body = _csv('STU1,40', 'STU8,41', 'STU9,42', header='Student_ID,Final_Exam_Score')
+    with pytest.raises(ingest.IngestError, match=r'is required for new students on line\(s\) 3, 4$'):
+        ingest.ingest(_current(), body, 'upsert')
+
+
+@pytest.mark.parametrize('line, message', [
+    ('STU4,Out Of Range,10,10,101,12,5,20', r'Attendance_Percentage is out of range on line\(s\) 4'),
+    ('STU4,Negative,-1,10,90,12,5,20', r'Internal_Assessment_1 is out of range on line\(s\) 4'),
+    ('STU4,Fractional,10,10.5,90,12,5,20', r'Internal_Assessment_2 must be a whole number on line\(s\) 4'),
+    ('STU4,,10,10,90,12,5,20', r'Name is missing on line\(s\) 4'),
+])
+def test_validation_errors_name_the_csv_line(line, message):
+    with pytest.raises(ingest.IngestError, match=message):
+        ingest.load_csv(_csv(ROSTER[0], ROSTER[1], line))
+
+
+def test_validation_line_numbers_span_chunks():
+    lines = ROSTER * 3 + ['STU4,Late Error,10,10,90,12,5,20.5']
+    with pytest.raises(ingest.IngestError, match=r'Final_Exam_Score must be a whole number on line\(s\) 11$'):
+        ingest.load_csv(_csv(*lines), chunk_rows=4)
+
+
+def test_validation_lists_a_bounded_number_of_lines():
+    lines = ['STU{0},S{0},10,10,150,12,5,20'.format(i) for i in range(8)]
+    with pytest.raises(ingest.IngestError, match=r'line\(s\) 2, 3, 4, 5, 6 and 3 more'):
+        ingest.load_csv(_csv(*lines))
+
+
+def test_unparseable_numbers_are_reported():
+    with pytest.raises(ingest.IngestError, match='Could not parse rows after line 1'):
+        ingest.load_csv(_csv('STU1,Ada Lovelace,twelve,14,91.5,18.2,7,30'))
+
+
+def test_missing_required_columns():
+    with pytest.raises(ingest.IngestError, match='missing required columns'):
+        ingest.load_csv(_csv('Ada Lovelace,12', header='Name,Internal_Assessment_1'))
+
+
+def test_empty_uploads():
+    with pytest.raises(ingest.IngestError, match='empty'):
+        ingest.load_csv(io.StringIO(''))
+    with pytest.raises(ingest.IngestError, match='no rows'):
+        ingest.load_csv(_csv())
+
+
+def test_unknown_mode():
+    with pytest.raises(ingest.IngestError, match='Unknown upload mode: merge'):
+        ingest.ingest(_current(), _csv(*ROSTER), 'merge')
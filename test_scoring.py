@@ -0,0 +1,111 @@
+import json
+
+import numpy as np
+import pytest
+
+import scoring
+from dataset import FEATURE_COLUMNS, PASS_THRESHOLD
+
+STUDENT = {'Internal_Assessment_1': 12, 'Internal_Assessment_2': 14, 'Attendance_Percentage': 91.5,
+           'Previous_Semester_Grade': 18.2, 'Participation_Score': 7}
+
+
+def _rows(*ids):
+    return [dict(STUDENT, **({'Student_ID': student_id} if student_id is not None else {})) for student_id in ids]
+
+
+def _stream(scores, ids, fmt):
+    return ''.join(scoring.stream_results(np.asarray(scores, dtype=float), ids, fmt))
+
+
+@pytest.mark.parametrize('content_type, fmt', [
+    ('application/json', 'json'),
+    ('application/json; charset=utf-8', 'json'),
+    (None, 'json'),
+    ('text/csv', 'csv'),
+    ('application/x-ndjson', 'ndjson'),
+    ('application/jsonl', 'ndjson'),
+])
+def test_batch_format(content_type, fmt):
+    assert scoring.batch_format(content_type) == fmt
+
+
+def test_parse_json_array():
+    block, ids = scoring.parse_batch(json.dumps(_rows('S1', 'S2')).encode(), 'json')
+    assert block.shape == (2, len(FEATURE_COLUMNS))
+    assert block[0].tolist() == [STUDENT[col] for col in FEATURE_COLUMNS]
+    assert ids == ['S1', 'S2']
+
+
+def test_parse_ndjson_skips_blank_lines():
+    body = '\n'.join(json.dumps(row) for row in _rows(None, None)) + '\n\n'
+    block, ids = scoring.parse_batch(body.encode(), 'ndjson')
+    assert len(block) == 2
+    assert ids is None
+
+
+def test_parse_csv_keeps_only_features_and_ids():
+    header = ','.join(['Student_ID', 'Name'] + FEATURE_COLUMNS)
+    values = ','.join(str(STUDENT[col]) for col in FEATURE_COLUMNS)
+    body = f'{header}\nS1,Ada,{values}\n'.encode()
+    block, ids = scoring.parse_batch(body, 'csv')
+    assert block[0].tolist() == [STUDENT[col] for col in FEATURE_COLUMNS]
+    assert ids == ['S1']
+
+
+def test_rows_without_an_id_get_none():
+    _, ids = scoring.parse_batch(json.dumps(_rows(None, 'S2', None)).encode(), 'json')
+    assert ids == [None, 'S2', None]
+
+
+@pytest.mark.parametrize('body, message', [
+    (b'{"Internal_Assessment_1": 1}', 'Expected a JSON array'),
+    (b'[]', 'No rows to score'),
+    (b'[{', 'Could not parse request body'),
+    (json.dumps([{'Internal_Assessment_1': 1}]).encode(), 'Missing required columns: Internal_Assessment_2'),
+    (json.dumps([STUDENT, dict(STUDENT, Attendance_Percentage='high')]).encode(),
+     'Column Attendance_Percentage has missing or non-numeric values at rows 1'),
+    (json.dumps([dict(STUDENT, Participation_Score=None)]).encode(),
+     'Column Participation_Score has missing or non-numeric values at rows 0'),
+])
+def test_parse_errors(body, message):
+    with pytest.raises(scoring.BatchError, match=message):
+        scoring.parse_batch(body, 'json')
+
+
+def test_json_results_with_some_ids():
+    scores = [PASS_THRESHOLD - 1, PASS_THRESHOLD]
+    results = json.loads(_stream(scores, [None, 'S2'], 'json'))
+    assert results == [{'prediction': 'Fail', 'score': PASS_THRESHOLD - 1},
+                       {'prediction': 'Pass', 'score': PASS_THRESHOLD, 'Student_ID': 'S2'}]
+
+
+def test_ndjson_results_with_some_ids():
+    lines = _stream([20, 10], ['S1', None], 'ndjson').splitlines()
+    assert [json.loads(line) for line in lines] == [{'prediction': 'Pass', 'score': 20.0, 'Student_ID': 'S1'},
+                                                    {'prediction': 'Fail', 'score': 10.0}]
+
+
+def test_csv_header_includes_ids_when_any_row_has_one():
+    assert _stream([10, 20], [None, 'S2'], 'csv').splitlines() == [
+        'prediction,score,Student_ID', 'Fail,10.0,', 'Pass,20.0,S2']
+    assert _stream([10], None, 'csv').splitlines() == ['prediction,score', 'Fail,10.0']
+
+
+def test_streamed_json_spans_chunks():
+    scores = np.full(scoring.STREAM_CHUNK_ROWS * 2 + 1, 20.0)
+    results = json.loads(_stream(scores, None, 'json'))
+    assert len(results) == len(scores)
+
+
+def test_micro_batcher_coalesces_rows():
+    calls = []
+
+    def predict(block):
+        calls.append(len(block))
+        return block.sum(axis=1)
+
+    batcher = scoring.MicroBatcher(predict, window=0.05, max_batch=3)
+    futures = [batcher.submit([i, 1]) for i in range(3)]
+    assert [future.result(timeout=5) for future in futures] == [1.0, 2.0, 3.0]
+    assert calls == [3]
@@ -0,0 +1,97 @@
+import mmap
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import store
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        'Student_ID': ['STU1', 'STU2', 'STU3', 'STU4'],
+        'Name': ['Ada Lovelace', 'Alan Turing', 'Ada Lovelace', None],
+        'Internal_Assessment_1': np.array([0, 12, 20, 7], dtype=np.int64),
+        'Big': np.array([0, 2**40, -5, 1], dtype=np.int64),
+        'Attendance_Percentage': [91.5, 55.0, 78.25, 100.0],
+        'Previous_Semester_Grade': [69.09, 12.0, 16.5, 0.1],
+        'Final_Exam_Score': pd.array([30, None, 33, 12], dtype='Int64'),
+        'Passed': [True, False, True, False],
+    })
+
+
+def test_round_trip_preserves_values(tmp_path, frame):
+    store.save(frame, str(tmp_path))
+    loaded = store.load(str(tmp_path))
+    assert list(loaded.columns) == list(frame.columns)
+    for col in frame.columns:
+        assert loaded[col].tolist() == frame[col].tolist(), col
+
+
+def test_round_trip_dtypes(tmp_path, frame):
+    store.save(frame, str(tmp_path))
+    loaded = store.load(str(tmp_path))
+    # Integers are narrowed to the smallest type that holds them
+    assert loaded['Internal_Assessment_1'].dtype == np.int8
+    assert loaded['Big'].dtype == np.int64
+    # Floats only shrink to float32 when every value round-trips exactly
+    assert loaded['Attendance_Percentage'].dtype == np.float32
+    assert loaded['Previous_Semester_Grade'].dtype == np.float64
+    assert isinstance(loaded['Name'].dtype, pd.CategoricalDtype)
+    assert loaded['Name'].isna().tolist() == [False, False, False, True]
+    assert isinstance(loaded['Final_Exam_Score'].dtype, pd.Int8Dtype)
+    assert loaded['Final_Exam_Score'].isna().tolist() == [False, True, False, False]
+    assert loaded['Passed'].dtype == bool
+
+
+def test_round_trip_is_memory_mapped(tmp_path, frame):
+    store.save(frame, str(tmp_path))
+    loaded = store.load(str(tmp_path))
+    values = loaded['Big'].to_numpy()
+    while isinstance(values, np.ndarray):
+        values = values.base
+    assert isinstance(values, mmap.mmap)
+
+
+def test_current_pointer_and_earlier_versions(tmp_path, frame):
+    root = str(tmp_path)
+    assert store.current_version(root) is None
+    first = store.save(frame, root)
+    second = store.save(frame.head(2), root)
+    assert store.current_version(root) == second
+    assert len(store.load(root)) == 2
+    assert len(store.load(root, first)) == 4
+
+
+def test_prune_keeps_recent_versions(tmp_path, frame):
+    root = str(tmp_path)
+    names = [store.save(frame, root) for _ in range(store.KEEP_VERSIONS + 2)]
+    kept = sorted(entry for entry in os.listdir(root) if os.path.isdir(os.path.join(root, entry)))
+    assert kept == names[-store.KEEP_VERSIONS:]
+
+
+def test_pointer_stamp_changes_on_publish(tmp_path, frame):
+    root = str(tmp_path)
+    assert store.pointer_stamp(root) is None
+    store.save(frame, root)
+    stamp = store.pointer_stamp(root)
+    store.save(frame, root)
+    assert store.pointer_stamp(root) != stamp
+
+
+def test_follower_loads_versions_published_elsewhere(tmp_path, frame):
+    root = str(tmp_path)
+    serving = [store.save(frame, root)]
+    follower = store.Follower(lambda: serving[-1], serving.append, root)
+    follower.poll()
+    assert len(serving) == 1
+    name = store.save(frame, root)
+    follower.poll()
+    assert serving == [serving[0], name]
+
+
+def test_load_without_data(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        store.load(str(tmp_path))
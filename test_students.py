@@ -0,0 +1,164 @@
+import io
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app as api
+from dataset import PASS_THRESHOLD
+
+HEADER = ('Student_ID,Name,Internal_Assessment_1,Internal_Assessment_2,Attendance_Percentage,'
+          'Previous_Semester_Grade,Participation_Score,Final_Exam_Score')
+ROSTER = [
+    'STU1,Ada Lovelace,12,14,91.5,18.2,7,30',
+    'STU2,Alan Turing,2,3,55.0,2.0,1,14',
+    'STU3,Grace Hopper,17,16,78.25,16.5,9,33',
+    'STU4,Adele Goldberg,15,15,99.0,19.0,8,35',
+    'STU5,Barbara Liskov,1,1,40.0,1.0,0,5',
+]
+
+_cohorts = itertools.count()
+
+
+def _upload(client, cohort, lines):
+    body = ('\n'.join([HEADER, *lines]) + '\n').encode()
+    response = client.post(f'/cohorts/{cohort}/upload', data={'file': (io.BytesIO(body), 'students.csv')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200, response.json
+
+
+@pytest.fixture
+def client():
+    return api.app.test_client()
+
+
+@pytest.fixture
+def cohort(client):
+    name = f'students-{next(_cohorts)}'
+    _upload(client, name, ROSTER)
+    return name
+
+
+def _get(client, cohort, query):
+    response = client.get(f'/cohorts/{cohort}/students?{query}')
+    return response.status_code, response.json
+
+
+def test_full_roster(client, cohort):
+    status, students = _get(client, cohort, '')
+    assert status == 200
+    assert [s['Student_ID'] for s in students] == ['STU1', 'STU2', 'STU3', 'STU4', 'STU5']
+
+
+def test_projection(client, cohort):
+    _, students = _get(client, cohort, 'fields=Name,Student_ID')
+    assert students[0] == {'Name': 'Ada Lovelace', 'Student_ID': 'STU1'}
+    status, body = _get(client, cohort, 'fields=Name,Shoe_Size')
+    assert status == 400
+    assert body['error'] == 'Unknown fields: Shoe_Size'
+
+
+def test_search_is_case_insensitive(client, cohort):
+    _, students = _get(client, cohort, 'search=ADA&fields=Name')
+    assert [s['Name'] for s in students] == ['Ada Lovelace']
+
+
+def test_min_max_filters(client, cohort):
+    _, students = _get(client, cohort, 'min_Attendance_Percentage=55&max_Attendance_Percentage=91.5&fields=Student_ID')
+    assert [s['Student_ID'] for s in students] == ['STU1', 'STU2', 'STU3']
+    assert _get(client, cohort, 'min_Name=A')[0] == 400
+    assert _get(client, cohort, 'min_Attendance_Percentage=high')[0] == 400
+
+
+def test_result_filter_splits_by_prediction(client, cohort):
+    ds = api.registry.get(cohort).current()
+    predictions = dict(zip(ds.df['Student_ID'].astype(str), ds.artifact('predictions')))
+    _, passed = _get(client, cohort, 'result=Pass&fields=Student_ID')
+    _, failed = _get(client, cohort, 'result=Fail&fields=Student_ID')
+    assert sorted(s['Student_ID'] for s in passed + failed) == sorted(predictions)
+    assert all(predictions[s['Student_ID']] >= PASS_THRESHOLD for s in passed)
+    assert all(predictions[s['Student_ID']] < PASS_THRESHOLD for s in failed)
+    assert _get(client, cohort, 'result=Maybe')[0] == 400
+
+
+def test_sort_order(client, cohort):
+    _, ascending = _get(client, cohort, 'sort=Attendance_Percentage&fields=Student_ID')
+    assert [s['Student_ID'] for s in ascending] == ['STU5', 'STU2', 'STU3', 'STU1', 'STU4']
+    _, descending = _get(client, cohort, 'sort=-Final_Exam_Score&fields=Student_ID')
+    assert [s['Student_ID'] for s in descending] == ['STU4', 'STU3', 'STU1', 'STU2', 'STU5']
+    assert _get(client, cohort, 'sort=Shoe_Size')[0] == 400
+
+
+def test_pages_follow_the_cursor(client, cohort):
+    query = 'sort=-Attendance_Percentage&fields=Student_ID&min_Attendance_Percentage=50'
+    status, page = _get(client, cohort, f'{query}&limit=2')
+    assert status == 200
+    assert (page['total'], page['offset'], page['limit']) == (4, 0, 2)
+    seen = [s['Student_ID'] for s in page['students']]
+    while page['next_cursor']:
+        # The page size may change between pages
+        _, page = _get(client, cohort, f"{query}&limit=1&cursor={page['next_cursor']}")
+        seen += [s['Student_ID'] for s in page['students']]
+    assert seen == ['STU4', 'STU1', 'STU3', 'STU2']
+
+
+def test_offset_pagination(client, cohort):
+    _, page = _get(client, cohort, 'offset=3&limit=10&fields=Student_ID')
+    assert [s['Student_ID'] for s in page['students']] == ['STU4', 'STU5']
+    assert page['next_cursor'] is None
+    assert _get(client, cohort, 'offset=-1')[0] == 400
+
+
+def test_cursor_replayed_with_a_different_query_is_rejected(client, cohort):
+    _, page = _get(client, cohort, 'sort=-Attendance_Percentage&limit=2')
+    for query in ('', 'sort=Attendance_Percentage', 'sort=-Attendance_Percentage&fields=Name',
+                  'sort=-Attendance_Percentage&search=ada', 'sort=-Attendance_Percentage&result=Pass'):
+        status, body = _get(client, cohort, f"{query}&limit=2&cursor={page['next_cursor']}")
+        assert status == 400, query
+        assert 'different query' in body['error']
+
+
+def test_stale_cursor_is_a_conflict(client, cohort):
+    _, page = _get(client, cohort, 'limit=2')
+    _upload(client, cohort, ROSTER[:4])
+    status, body = _get(client, cohort, f"limit=2&cursor={page['next_cursor']}")
+    assert status == 409
+    assert 'restart pagination' in body['error']
+
+
+def test_malformed_cursor(client, cohort):
+    assert _get(client, cohort, 'cursor=not-a-cursor')[0] == 400
+
+
+def test_model_swap_keeps_data_artifacts_etags_and_cursors(client, cohort, monkeypatch):
+    before = api.registry.get(cohort).current()
+    index = before.artifact('id_index')
+    predictions = before.artifact('predictions')
+    roster = client.get(f'/cohorts/{cohort}/students')
+    analytics = client.get(f'/cohorts/{cohort}/analytics')
+    _, page = _get(client, cohort, 'limit=2')
+
+    monkeypatch.setattr(api, 'model_version', 'another-model')
+    after = api.registry.get(cohort).current()
+    assert after is not before and after.data_version == before.data_version
+    assert after.artifact('id_index') is index
+    assert after.artifact('predictions') is not predictions
+    assert client.get(f'/cohorts/{cohort}/students', headers={'If-None-Match': roster.headers['ETag']}
+                      ).status_code == 304
+    assert client.get(f'/cohorts/{cohort}/analytics', headers={'If-None-Match': analytics.headers['ETag']}
+                      ).status_code == 200
+    assert _get(client, cohort, f"limit=2&cursor={page['next_cursor']}")[0] == 200
+
+
+def test_explanation_adds_up_to_the_prediction(client, cohort):
+    explanation = client.get(f'/cohorts/{cohort}/explain/STU2').json
+    assert explanation['base_value'] + sum(explanation['contributions'].values()) == \
+        pytest.approx(explanation['predicted_score'])
+    assert client.get(f'/cohorts/{cohort}/explain/STU9').status_code == 404
+
+
+def test_one_explainer_per_model_version(cohort):
+    version = api.registry.get(cohort).current().model_version
+    with ThreadPoolExecutor(4) as pool:
+        explainers = set(map(id, pool.map(lambda _: api.tree_explainer(version), range(8))))
+    assert len(explainers) == 1
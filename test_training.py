@@ -0,0 +1,201 @@
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dataset
+import models
+import store
+import synthetic
+import training
+
+
+class Constant:
+    """A serving model that predicts the same score for everyone."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def predict(self, X):
+        return np.full(len(X), self.value, dtype=float)
+
+
+@pytest.fixture(scope='module')
+def frame():
+    return synthetic.generate(200, seed=3)
+
+
+@pytest.fixture(scope='module')
+def holdout(frame):
+    _, X_test, _, y_test = training.split(frame)
+    return X_test, y_test
+
+
+def test_split_needs_a_target_and_enough_rows(frame):
+    with pytest.raises(training.TrainingError, match='no Final_Exam_Score'):
+        training.split(frame.drop(columns='Final_Exam_Score'))
+    with pytest.raises(training.TrainingError, match='at least 50'):
+        training.split(frame.head(training.MIN_TRAINING_ROWS - 1))
+
+
+def test_split_skips_students_without_a_score(frame):
+    scored = frame.astype({'Final_Exam_Score': 'Int64'})
+    scored.loc[:9, 'Final_Exam_Score'] = pd.NA
+    X_train, X_test, _, _ = training.split(scored)
+    assert len(X_train) + len(X_test) == len(frame) - 10
+
+
+def test_fit_reports_holdout_metrics(frame):
+    model, report, (X_test, y_test) = training.fit(frame, n_jobs=1)
+    assert report['train_rows'] + report['test_rows'] == len(frame)
+    assert report['r2'] > training.MIN_R2
+    assert model[-1].n_jobs is None
+    assert len(X_test) == report['test_rows'] == len(y_test)
+
+
+def test_validate_accepts_a_candidate_as_good_as_the_serving_model(holdout):
+    X, y = holdout
+    baseline = training.validate({'r2': 0.9}, Constant(float(y.mean())), holdout)
+    assert baseline == pytest.approx(0.0, abs=1e-9)
+
+
+def test_validate_rejects_non_finite_predictions(holdout):
+    with pytest.raises(training.ValidationError, match='non-finite'):
+        training.validate({'r2': None}, Constant(0), holdout)
+
+
+def test_validate_rejects_a_weak_candidate(holdout):
+    with pytest.raises(training.ValidationError, match='below 0.5'):
+        training.validate({'r2': training.MIN_R2 - 0.01}, Constant(0), holdout)
+
+
+def test_validate_rejects_a_candidate_worse_than_serving(frame, holdout):
+    serving, report, _ = training.fit(frame, n_jobs=1)
+    with pytest.raises(training.ValidationError, match="worse than the serving model's"):
+        training.validate({'r2': report['r2'] - training.MAX_R2_DROP - 0.01}, serving, holdout)
+    # Within MAX_R2_DROP of the serving model is still accepted
+    assert training.validate({'r2': report['r2'] - training.MAX_R2_DROP / 2}, serving, holdout) == \
+        pytest.approx(report['r2'])
+
+
+def test_validate_ignores_a_serving_model_that_cannot_score(holdout):
+    assert training.validate({'r2': 0.9}, Constant(np.nan), holdout) is None
+
+
+# Model store -------------------------------------------------------------------
+
+def _save(root, value):
+    return models.save(Constant(value), {'value': value}, root)
+
+
+def test_save_makes_each_version_current(tmp_path):
+    root = str(tmp_path)
+    first = _save(root, 1)
+    second = _save(root, 2)
+    assert models.current_version(root) == second
+    assert models.history(root) == [first, second]
+    assert models.meta(second, root)['value'] == 2
+    assert models.load(first, root).value == 1
+
+
+def test_save_prunes_old_versions(tmp_path):
+    root = str(tmp_path)
+    names = [_save(root, value) for value in range(models.KEEP_MODELS + 2)]
+    assert models.history(root) == names[-models.KEEP_MODELS:]
+
+
+def test_rollback_walks_back_one_version_at_a_time(tmp_path):
+    root = str(tmp_path)
+    names = [_save(root, value) for value in range(3)]
+    assert models.rollback(root) == names[1]
+    assert models.current_version(root) == names[1]
+    assert models.rollback(root) == names[0]
+    with pytest.raises(models.RollbackError):
+        models.rollback(root)
+    # A new save becomes current again, ahead of every earlier version
+    newest = _save(root, 3)
+    assert models.current_version(root) == newest
+    assert models.rollback(root) == names[2]
+
+
+def test_import_once_copies_the_pickle_only_into_an_empty_store(tmp_path):
+    root = str(tmp_path / 'models')
+    pickle = tmp_path / 'model.pkl'
+    pickle.write_bytes(b'not really a model')
+    first = models.import_once(str(pickle), root)
+    assert models.meta(first, root)['source'] == str(pickle)
+    saved = _save(root, 1)
+    assert models.import_once(str(pickle), root) == saved
+
+
+# Retrainer ---------------------------------------------------------------------
+
+def _wait(retrainer, job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = retrainer.get(job_id)
+        if job.get('finished'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'job {job_id} did not finish')
+
+
+def _retrainer(job_dir, installed):
+    def install(model, report):
+        installed.append(report)
+        return 'v1'
+    return training.Retrainer(lambda: Constant(0), install, str(job_dir), n_jobs=1)
+
+
+def test_retrainer_runs_and_records_a_job(tmp_path, frame):
+    installed = []
+    retrainer = _retrainer(tmp_path, installed)
+    ds = dataset.Dataset(frame, 1)
+    job, started = retrainer.submit(ds)
+    assert started and job['status'] == 'queued'
+    job = _wait(retrainer, job['id'])
+    assert job['status'] == 'succeeded'
+    assert job['model_version'] == 'v1'
+    assert installed[0]['dataset_version'] == ds.version
+    # The training pool was forked while the job held RUNNING; the lock must not outlive the job
+    claim = store.try_lock(os.path.join(str(tmp_path), training.RUNNING_FILE))
+    assert claim is not None
+    store.unlock(claim)
+
+
+def test_retrainer_reports_failures(tmp_path, frame):
+    retrainer = _retrainer(tmp_path, [])
+    job, _ = retrainer.submit(dataset.Dataset(frame.drop(columns='Final_Exam_Score'), 1))
+    job = _wait(retrainer, job['id'])
+    assert job['status'] == 'failed'
+    assert 'Final_Exam_Score' in job['error']
+
+
+def test_one_job_at_a_time_across_processes(tmp_path, frame):
+    path = os.path.join(str(tmp_path), training.RUNNING_FILE)
+    # Another worker process holds RUNNING for a job it is running
+    holder = subprocess.Popen(
+        [sys.executable, '-c',
+         'import sys, time, store\n'
+         'claim = store.try_lock(sys.argv[1])\n'
+         'claim.write("0123456789ab"); claim.flush()\n'
+         'print("locked", flush=True)\n'
+         'time.sleep(60)\n', path],
+        stdout=subprocess.PIPE, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    try:
+        assert holder.stdout.readline().strip() == 'locked'
+        retrainer = _retrainer(tmp_path, [])
+        job, started = retrainer.submit(dataset.Dataset(frame, 1))
+        assert not started
+        assert job['id'] == '0123456789ab'
+    finally:
+        holder.kill()
+        holder.wait()
+    # The kernel drops the lock with the process, so the next job may start
+    job, started = retrainer.submit(dataset.Dataset(frame, 1))
+    assert started
+    _wait(retrainer, job['id'])
@@ -0,0 +1,230 @@
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+import store
+from dataset import FEATURE_COLUMNS
+
+TARGET_COLUMN = 'Final_Exam_Score'
+
+# Split and seed from Data.ipynb, so retraining on the original CSV
+# reproduces model_pipeline.pkl
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+
+MIN_TRAINING_ROWS = 50
+
+# A candidate is rejected below this holdout R², or when it scores more than
+# MAX_R2_DROP below the serving model on the same holdout
+MIN_R2 = 0.5
+MAX_R2_DROP = 0.05
+
+# Job records kept for /model/jobs/<id>
+KEEP_JOBS = 32
+JOB_ID = re.compile(r'^[0-9a-f]{12}$')
+
+# Locked by whichever process is running a job, and names that job
+RUNNING_FILE = 'RUNNING'
+
+
+class TrainingError(ValueError):
+    pass
+
+
+class ValidationError(ValueError):
+    pass
+
+
+def build_pipeline(n_jobs=None):
+    """The scaler + random forest pipeline from Data.ipynb."""
+    return make_pipeline(StandardScaler(), RandomForestRegressor(random_state=RANDOM_STATE, n_jobs=n_jobs))
+
+
+def split(df):
+    if TARGET_COLUMN not in df.columns:
+        raise TrainingError(f'The dataset has no {TARGET_COLUMN} column to train on')
+    labelled = df[FEATURE_COLUMNS + [TARGET_COLUMN]].dropna()
+    if len(labelled) < MIN_TRAINING_ROWS:
+        raise TrainingError(f'Need at least {MIN_TRAINING_ROWS} students with a {TARGET_COLUMN} '
+                            f'to train, got {len(labelled)}')
+    X = labelled[FEATURE_COLUMNS].astype(np.float64)
+    y = labelled[TARGET_COLUMN].astype(np.float64)
+    return train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+
+
+def evaluate(model, X, y):
+    predictions = np.asarray(model.predict(X), dtype=np.float64)
+    if not np.isfinite(predictions).all():
+        return {'r2': None, 'mae': None}
+    return {'r2': float(r2_score(y, predictions)), 'mae': float(mean_absolute_error(y, predictions))}
+
+
+def fit(df, n_jobs=-1):
+    """Fit a new pipeline on df. Runs in the training process.
+
+    Returns the model, its holdout metrics and the holdout itself so the
+    serving process can score its own model on the same rows.
+    """
+    X_train, X_test, y_train, y_test = split(df)
+    start = time.perf_counter()
+    model = build_pipeline(n_jobs).fit(X_train, y_train)
+    # Serve single-threaded; the serving process parallelises across requests
+    model[-1].set_params(n_jobs=None)
+    report = {
+        'train_rows': len(X_train),
+        'test_rows': len(X_test),
+        'fit_seconds': round(time.perf_counter() - start, 3),
+        **evaluate(model, X_test, y_test)
+    }
+    return model, report, (X_test, y_test)
+
+
+def validate(report, serving, holdout):
+    """Raise ValidationError unless the candidate is fit to replace the serving model."""
+    if report['r2'] is None:
+        raise ValidationError('Candidate model produced non-finite predictions')
+    if report['r2'] < MIN_R2:
+        raise ValidationError(f"Candidate holdout R² {report['r2']:.3f} is below {MIN_R2}")
+    baseline = evaluate(serving, *holdout)['r2']
+    if baseline is not None and report['r2'] < baseline - MAX_R2_DROP:
+        raise ValidationError(f"Candidate holdout R² {report['r2']:.3f} is worse than the "
+                              f"serving model's {baseline:.3f}")
+    return baseline
+
+
+def _pool_context():
+    # Fork so the training process does not re-import the serving app
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+class Retrainer:
+    """Run one retraining job at a time without blocking request handling.
+
+    Fitting happens in a single-process pool, using every core through the
+    forest's n_jobs. Validation and `install(model, report)` run on a
+    helper thread in the serving process once the fit returns; `install`
+    persists and swaps in the model and returns its version name.
+
+    Job records are JSON files under job_dir, so any worker can report on
+    a job another worker started. The worker running a job holds a lock on
+    job_dir/RUNNING, so with pre-forked workers there is still only one
+    job at a time; the lock goes away with the worker if it dies.
+    """
+
+    def __init__(self, serving, install, job_dir, n_jobs=-1):
+        self.serving = serving
+        self.install = install
+        self.job_dir = job_dir
+        self.n_jobs = n_jobs
+        self._pool = None
+        self._running = None
+        self._claim = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=1, mp_context=_pool_context())
+        return self._pool
+
+    def _path(self, job_id):
+        return os.path.join(self.job_dir, f'{job_id}.json')
+
+    def _write(self, job):
+        # Readers see the previous or the new record, never a partial one
+        path = self._path(job['id'])
+        staging = f'{path}.{uuid.uuid4().hex[:8]}.tmp'
+        with open(staging, 'w') as f:
+            json.dump(job, f)
+        os.replace(staging, path)
+
+    def _prune(self):
+        records = sorted((entry for entry in os.listdir(self.job_dir) if entry.endswith('.json')),
+                         key=lambda entry: os.path.getmtime(os.path.join(self.job_dir, entry)))
+        for entry in records[:-KEEP_JOBS]:
+            try:
+                os.remove(os.path.join(self.job_dir, entry))
+            except FileNotFoundError:
+                pass
+
+    def _running_elsewhere(self):
+        with open(os.path.join(self.job_dir, RUNNING_FILE)) as f:
+            job_id = f.read().strip()
+        # The other worker may not have written its record yet
+        return self.get(job_id) or {'id': job_id or None, 'status': 'queued'}
+
+    def submit(self, ds):
+        """Start a job on dataset version ds. Returns (job, started)."""
+        with self._lock:
+            if self._running is not None:
+                return dict(self._running), False
+            os.makedirs(self.job_dir, exist_ok=True)
+            claim = store.try_lock(os.path.join(self.job_dir, RUNNING_FILE))
+            if claim is None:
+                return self._running_elsewhere(), False
+            job = {
+                'id': uuid.uuid4().hex[:12],
+                'status': 'queued',
+                'dataset_version': ds.version,
+                'submitted': time.time()
+            }
+            claim.truncate(0)
+            claim.write(job['id'])
+            claim.flush()
+            self._write(job)
+            self._prune()
+            self._running = job
+            self._claim = claim
+            # Copied before the job thread starts updating it
+            queued = dict(job)
+        threading.Thread(target=self._run, args=(job, ds.df), name='model-retrain', daemon=True).start()
+        return queued, True
+
+    def get(self, job_id):
+        if not JOB_ID.match(job_id):
+            return None
+        try:
+            with open(self._path(job_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _update(self, job, **fields):
+        with self._lock:
+            job.update(fields)
+            self._write(job)
+
+    def _run(self, job, df):
+        try:
+            self._update(job, status='training', started=time.time())
+            columns = [col for col in FEATURE_COLUMNS + [TARGET_COLUMN] if col in df.columns]
+            model, report, holdout = self._executor().submit(fit, df[columns], self.n_jobs).result()
+            self._update(job, status='validating', metrics=report)
+            serving_r2 = validate(report, self.serving(), holdout)
+            self._update(job, status='installing', serving_r2=serving_r2)
+            version = self.install(model, {**report, 'dataset_version': job['dataset_version']})
+            self._update(job, status='succeeded', model_version=version)
+        except ValidationError as e:
+            self._update(job, status='rejected', error=str(e))
+        except Exception as e:
+            self._update(job, status='failed', error=str(e))
+        finally:
+            with self._lock:
+                job['finished'] = time.time()
+                self._write(job)
+                self._running = None
+                store.unlock(self._claim)
+                self._claim = None